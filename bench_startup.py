@@ -0,0 +1,97 @@
+"""
+Бенчмарк часу старту: скільки коштує імпорт бота до початку polling.
+Запускає чистий інтерпретатор, окремо міряє базовий імпорт aiogram та
+власні модулі бота поверх нього, друкує найдорожчі модулі (-X importtime)
+і перевіряє бюджет та відсутність важких бібліотек (matplotlib, openpyxl).
+
+    python bench_startup.py [--budget-ms 300] [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+# Що імпортує main.py до старту polling; aiogram міряється окремо як база
+BASELINE_IMPORT = "import aiogram, aiogram.types, aiogram.client.session.aiohttp"
+STARTUP_IMPORT = "import main"
+# Бібліотеки, які мають завантажуватися лише при першому використанні або в процесах рендерера
+FORBIDDEN = ("pandas", "matplotlib", "openpyxl", "numpy")
+
+CHILD = f"""
+import resource, sys, time
+t = time.perf_counter()
+{BASELINE_IMPORT}
+baseline = (time.perf_counter() - t) * 1000
+t = time.perf_counter()
+{STARTUP_IMPORT}
+own = (time.perf_counter() - t) * 1000
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = [m for m in {FORBIDDEN!r} if m in sys.modules]
+print(f"{{baseline:.1f}} {{own:.1f}} {{rss}} {{','.join(heavy)}}")
+"""
+
+
+def run_once(importtime: bool = False) -> subprocess.CompletedProcess:
+    env = {**os.environ, "BOT_TOKEN": os.environ.get("BOT_TOKEN", "0:benchmark")}
+    cmd = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", CHILD]
+    return subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def top_modules(stderr: str, limit: int, max_depth: int = 2) -> list[tuple[int, str]]:
+    """Модулі з найбільшим сумарним часом імпорту (мкс) з виводу -X importtime"""
+    result = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= max_depth:
+            result.append((int(cumulative), "  " * depth + name.strip()))
+    return sorted(result, reverse=True)[:limit]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк часу імпорту бота")
+    parser.add_argument(
+        "--budget-ms", type=float, default=300.0,
+        help="бюджет медіанного часу імпорту модулів бота (без aiogram)",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    baselines, times, rss = [], [], []
+    heavy = ""
+    for _ in range(args.runs):
+        baseline, own, max_rss, heavy = run_once().stdout.strip("\n").split(" ", 3)
+        baselines.append(float(baseline))
+        times.append(float(own))
+        rss.append(int(max_rss))
+
+    median = statistics.median(times)
+    print(f"База (aiogram): медіана {statistics.median(baselines):.0f} мс")
+    print(f"Модулі бота ('{STARTUP_IMPORT}'): медіана {median:.0f} мс "
+          f"(мін {min(times):.0f}, макс {max(times):.0f})")
+    print(f"Пікова RSS після імпорту: {max(rss) // 1024} МБ")
+
+    print("\nНайдорожчі модулі (сумарно, мс):")
+    for cumulative, name in top_modules(run_once(importtime=True).stderr, args.top):
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+
+    ok = True
+    if heavy:
+        print(f"\nПОМИЛКА: під час старту імпортовано важкі бібліотеки: {heavy}")
+        ok = False
+    if median > args.budget_ms:
+        print(f"\nПОМИЛКА: перевищено бюджет {args.budget_ms:.0f} мс")
+        ok = False
+    if ok:
+        print(f"\nOK: в межах бюджету {args.budget_ms:.0f} мс")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""Кеші в пам'яті процесу"""
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+# Ознака промаху UserCache (None - допустиме закешоване значення)
+MISSING: Any = object()
+
+
+def approx_size(value: Any) -> int:
+    """Приблизний розмір значення в байтах (рядки БД: кортежі/списки простих типів)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(approx_size(item) for item in value)
+    return size
+
+
+class BytesLRUCache:
+    """
+    LRU-кеш байтових значень (PNG графіків) з обмеженням за сумарним розміром.
+    Ключ має містити версію даних користувача, тоді застарілі значення
+    ніколи не повертаються, а просто витісняються.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[Hashable, bytes] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> bytes | None:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._items.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, int | float]:
+        """Лічильники для моніторингу"""
+        total = self.hits + self.misses
+        return {
+            "items": len(self._items),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class LRUDict:
+    """Невеликий LRU-словник з обмеженням кількості записів (напр. file_id Telegram)"""
+
+    def __init__(self, max_items: int) -> None:
+        self.max_items = max_items
+        self._items: OrderedDict[Hashable, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> str | None:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        self._items.pop(key, None)
+
+
+class UserCache:
+    """
+    Кеш результатів читання з БД по користувачах: TTL, ліміт записів і байтів (LRU).
+
+    Записи користувача скидаються invalidate(user_id) після кожного запису в БД.
+    Щоб читання, яке почалося до запису, а завершилося після нього, не поклало
+    в кеш застарілі дані, put приймає покоління з begin(): значення відкидається,
+    якщо користувача інвалідовано після початку читання.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        # (user_id, key) -> (значення, час завершення дії, розмір)
+        self._items: OrderedDict[tuple[int, Hashable], tuple[Any, float, int]] = OrderedDict()
+        self._keys_by_user: dict[int, set[Hashable]] = {}
+        self.size = 0
+        # Покоління: глобальний лічильник і останнє скидання кожного користувача
+        self._generation = 0
+        self._invalidated: OrderedDict[int, int] = OrderedDict()
+        self._invalidated_floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def begin(self) -> int:
+        """Покоління на початку читання (передати в put)"""
+        return self._generation
+
+    def get(self, user_id: int, key: Hashable) -> Any:
+        """Значення або MISSING"""
+        item = self._items.get((user_id, key))
+        if item is None:
+            self.misses += 1
+            return MISSING
+        value, expires_at, _ = item
+        if expires_at <= self._clock():
+            self._remove(user_id, key)
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+        self._items.move_to_end((user_id, key))
+        self.hits += 1
+        return value
+
+    def put(self, user_id: int, key: Hashable, value: Any, generation: int) -> None:
+        if generation < self._invalidated.get(user_id, self._invalidated_floor):
+            self.stale_puts += 1
+            return
+        size = approx_size(value)
+        if size > self.max_bytes:
+            return
+        if (user_id, key) in self._items:
+            self._remove(user_id, key)
+        self._items[(user_id, key)] = (value, self._clock() + self.ttl, size)
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        self.size += size
+        while len(self._items) > self.max_entries or self.size > self.max_bytes:
+            evicted_user, evicted_key = next(iter(self._items))
+            self._remove(evicted_user, evicted_key)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        """Скинути всі записи користувача (викликається після запису в БД)"""
+        self._generation += 1
+        self._invalidated[user_id] = self._generation
+        self._invalidated.move_to_end(user_id)
+        # Пам'ятати скидання лише для обмеженої кількості користувачів; для решти
+        # діє нижня межа - консервативно відкидає значення старіших читань
+        while len(self._invalidated) > self.max_entries:
+            _, generation = self._invalidated.popitem(last=False)
+            self._invalidated_floor = max(self._invalidated_floor, generation)
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._remove(user_id, key)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        """Скинути весь кеш (напр. після перебудови проєкцій)"""
+        self._generation += 1
+        self._invalidated.clear()
+        self._invalidated_floor = self._generation
+        self._items.clear()
+        self._keys_by_user.clear()
+        self.size = 0
+
+    def _remove(self, user_id: int, key: Hashable) -> None:
+        _, _, size = self._items.pop((user_id, key))
+        self.size -= size
+        keys = self._keys_by_user[user_id]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user[user_id]
+
+    def stats(self) -> dict[str, int | float]:
+        """Лічильники для моніторингу"""
+        total = self.hits + self.misses
+        return {
+            "items": len(self._items),
+            "users": len(self._keys_by_user),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Об'єднання однакових одночасних викликів (single-flight).
+
+    Перший виклик з ключем запускає задачу, решта до її завершення чекають той
+    самий результат. Задача захищена від скасування окремими викликачами.
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Помилку вже отримали викликачі; якщо всіх скасовано - не логувати її
+            task.exception()
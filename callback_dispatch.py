@@ -0,0 +1,160 @@
+"""
+Маршрутизація callback_data одним обробником aiogram.
+
+Точні значення шукаються в словнику, префікси - у префіксному дереві, тож
+вартість маршрутизації залежить лише від довжини callback_data (до 64 байт),
+а не від кількості кнопок. Обробник отримує вже розібрані аргументи.
+"""
+import inspect
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import Router
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+Handler = Callable[..., Awaitable[Any]]
+# Розбір залишку callback_data після префікса: kwargs для обробника.
+# ValueError/KeyError/IndexError означають, що маршрут не підходить.
+Parser = Callable[[str], dict[str, Any]]
+
+_PARSE_ERRORS = (ValueError, KeyError, IndexError)
+
+
+def int_arg(name: str) -> Parser:
+    """Залишок callback_data - ціле число (id) з іменем name"""
+    return lambda rest: {name: int(rest)}
+
+
+def str_arg(name: str) -> Parser:
+    """Залишок callback_data - непорожній рядок з іменем name"""
+    def parse(rest: str) -> dict[str, Any]:
+        if not rest:
+            raise ValueError("порожній аргумент")
+        return {name: rest}
+
+    return parse
+
+
+class _Route:
+    """Обробник з необов'язковим фільтром стану FSM і розбором аргументів"""
+
+    __slots__ = ("handler", "state", "parse", "params", "varkw")
+
+    def __init__(self, handler: Handler, state: State | str | None, parse: Parser | None) -> None:
+        self.handler = handler
+        self.state = state.state if isinstance(state, State) else state
+        self.parse = parse
+        # Які аргументи приймає обробник (перший - сам callback)
+        parameters = list(inspect.signature(handler).parameters.values())[1:]
+        self.params = frozenset(p.name for p in parameters if p.kind != p.VAR_KEYWORD)
+        self.varkw = any(p.kind == p.VAR_KEYWORD for p in parameters)
+
+    def kwargs(self, data: dict[str, Any]) -> dict[str, Any]:
+        if self.varkw:
+            return data
+        return {name: value for name, value in data.items() if name in self.params}
+
+
+class _Node:
+    __slots__ = ("children", "routes")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.routes: list[_Route] = []
+
+
+class CallbackDispatcher:
+    """
+    Реєстр обробників callback-кнопок.
+
+        callbacks = CallbackDispatcher()
+
+        @callbacks.exact(CallbackData.VIEW_HISTORY)
+        async def view_history(callback, state): ...
+
+        @callbacks.prefix(CallbackData.DELETE_BUDGET_PREFIX, parse=int_arg("budget_id"))
+        async def delete_budget_confirm(callback, state, budget_id): ...
+
+    Точне значення має пріоритет над префіксами; серед префіксів перемагає
+    найдовший, а на одному префіксі - перший зареєстрований маршрут, чий стан
+    збігається з поточним (маршрут без стану підходить завжди). Залишок після
+    префікса доступний обробнику як value, якщо parse не задано.
+    """
+
+    def __init__(self) -> None:
+        self._exact: dict[str, list[_Route]] = {}
+        self._root = _Node()
+
+    def exact(self, value: str, state: State | str | None = None) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self._exact.setdefault(str(value), []).append(_Route(handler, state, None))
+            return handler
+
+        return decorator
+
+    def prefix(
+        self,
+        prefix: str,
+        state: State | str | None = None,
+        parse: Parser | None = None,
+    ) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            node = self._root
+            for char in str(prefix):
+                node = node.children.setdefault(char, _Node())
+            node.routes.append(_Route(handler, state, parse))
+            return handler
+
+        return decorator
+
+    def resolve(self, data: str, raw_state: str | None = None) -> tuple[_Route, dict[str, Any]] | None:
+        """Знайти маршрут для callback_data: (маршрут, розібрані аргументи) або None"""
+        for route in self._exact.get(data, ()):
+            if route.state is None or route.state == raw_state:
+                return route, {}
+
+        # Вузли з маршрутами вздовж шляху: (довжина префікса, вузол)
+        matches: list[tuple[int, _Node]] = []
+        node = self._root
+        for depth, char in enumerate(data, 1):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.routes:
+                matches.append((depth, node))
+
+        for depth, node in reversed(matches):
+            rest = data[depth:]
+            for route in node.routes:
+                if route.state is not None and route.state != raw_state:
+                    continue
+                if route.parse is None:
+                    return route, {"value": rest}
+                try:
+                    return route, route.parse(rest)
+                except _PARSE_ERRORS:
+                    continue
+        return None
+
+    def as_router(self, name: str = "callbacks") -> Router:
+        """Router aiogram з одним обробником callback_query для всіх маршрутів"""
+        router = Router(name=name)
+
+        async def match(callback: CallbackQuery, raw_state: str | None = None) -> bool | dict[str, Any]:
+            if callback.data is None:
+                return False
+            found = self.resolve(callback.data, raw_state)
+            if found is None:
+                return False
+            return {"callback_route": found}
+
+        @router.callback_query(match)
+        async def dispatch(callback: CallbackQuery, callback_route, **data: Any) -> Any:
+            route, args = callback_route
+            return await route.handler(callback, **route.kwargs({**data, **args}))
+
+        return router
+
+
+callbacks = CallbackDispatcher()
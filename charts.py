@@ -0,0 +1,87 @@
+"""
+Побудова PNG-графіків matplotlib.
+Виконується у процесах рендерера (див. renderer.py), тому модуль не імпортує
+нічого з бота і отримує лише прості дані: підписи, значення, місяці.
+"""
+import io
+import os
+
+
+def init_worker() -> None:
+    """Ініціалізатор процесу: імпорт matplotlib і налаштування шрифту один раз"""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    # Налаштування для українських символів
+    plt.rcParams["font.family"] = "DejaVu Sans"
+    plt.rcParams["axes.unicode_minus"] = False
+
+
+def warm_up() -> int:
+    """Порожнє завдання, щоб процес стартував і завантажив matplotlib заздалегідь"""
+    import matplotlib.pyplot as plt
+
+    plt.figure().clear()
+    plt.close("all")
+    return os.getpid()
+
+
+def _to_png(fig) -> bytes:
+    import matplotlib.pyplot as plt
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100, bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def render_pie(labels: list[str], sizes: list[float], title: str) -> bytes:
+    """Кругова діаграма"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    colors = plt.cm.Set3(range(len(labels)))
+
+    wedges, texts, autotexts = ax.pie(
+        sizes,
+        labels=labels,
+        autopct="%1.1f%%",
+        colors=colors,
+        startangle=90,
+    )
+
+    # Поліпшення читабельності
+    for text in texts:
+        text.set_fontsize(10)
+    for autotext in autotexts:
+        autotext.set_color("white")
+        autotext.set_fontweight("bold")
+        autotext.set_fontsize(10)
+
+    ax.axis("equal")
+    ax.set_title(title, fontsize=16, fontweight="bold", pad=20)
+    return _to_png(fig)
+
+
+def render_dynamics(months: list[str], income: list[float], expense: list[float]) -> bytes:
+    """Лінійний графік доходів і витрат по місяцях"""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    x = range(len(months))
+
+    ax.plot(x, income, marker="o", label="Доходи", linewidth=2, color="green", markersize=6)
+    ax.plot(x, expense, marker="o", label="Витрати", linewidth=2, color="red", markersize=6)
+
+    ax.set_xlabel("Місяць", fontsize=12)
+    ax.set_ylabel("Сума (грн)", fontsize=12)
+    ax.set_title("Динаміка доходів та витрат", fontsize=16, fontweight="bold")
+    ax.legend(fontsize=12)
+    ax.grid(True, alpha=0.3)
+    ax.set_xticks(x)
+    ax.set_xticklabels(months, rotation=45, ha="right")
+
+    fig.tight_layout()
+    return _to_png(fig)
@@ -1,5 +1,6 @@
 """Конфігурація бота через Pydantic Settings"""
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,7 +16,64 @@ class Settings(BaseSettings):
 
     BOT_TOKEN: str
     DB_NAME: str = "finance.db"
+    # Пул з'єднань SQLite та PRAGMA, що застосовуються до кожного з'єднання
+    DB_POOL_SIZE: int = 4
+    DB_JOURNAL_MODE: str = "WAL"
+    DB_SYNCHRONOUS: str = "NORMAL"
+    DB_CACHE_SIZE: int = -16000  # від'ємне значення - розмір у KiB
+    DB_MMAP_SIZE: int = 64 * 1024 * 1024
+    DB_BUSY_TIMEOUT: int = 5000  # мс
+    DB_HEALTH_CHECK_INTERVAL: float = 60.0  # с простою до перевірки з'єднання
+    # Груповий коміт: записи, що надійшли за вікно, комітяться разом
+    DB_WRITE_BATCH_WINDOW_MS: float = 2.0
+    DB_WRITE_MAX_BATCH: int = 256
+    # Пул процесів для рендерингу графіків
+    RENDER_WORKERS: int = 2
+    RENDER_MAX_PENDING: int = 8  # більше завдань у черзі - відмова
+    RENDER_TIMEOUT: float = 30.0  # с
+    CHART_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # кеш готових PNG
+    FILE_ID_CACHE_SIZE: int = 10000  # file_id надісланих графіків та експортів
+    # Кеш читань з БД по користувачах (баланс, підсумки, сторінки історії, бюджети)
+    READ_CACHE_TTL: float = 300.0  # с
+    READ_CACHE_MAX_ENTRIES: int = 20000
+    READ_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # Обмеження частоти дій користувача (token bucket): швидкість (токенів/с) і запас
+    THROTTLE_RATE: float = 2.0
+    THROTTLE_BURST: int = 8
+    # Важкі дії: графіки, експорт, звіти
+    THROTTLE_HEAVY_RATE: float = 0.2
+    THROTTLE_HEAVY_BURST: int = 3
+    THROTTLE_MAX_USERS: int = 10000  # стан бакетів для неактивних користувачів витісняється
+    MESSAGE_FINGERPRINT_CACHE_SIZE: int = 50000  # відбитки останнього вмісту повідомлень бота
+    KEYBOARD_CACHE_SIZE: int = 1024  # клавіатури з параметрами (історія, бюджети, підтвердження)
+    # Експорт: розмір пакета з курсора та поріг, після якого файл іде на диск
+    EXPORT_CHUNK_SIZE: int = 500
+    EXPORT_SPOOL_MAX_BYTES: int = 1024 * 1024
+    EXPORT_WORKERS: int = 2  # одночасних експортів
+    EXPORT_QUEUE_SIZE: int = 50  # більше завдань у черзі - відмова
+    EXPORT_PROGRESS_INTERVAL: float = 3.0  # с між оновленнями повідомлення прогресу
+    EXPORT_JOBS_KEEP_DAYS: int = 7  # завершені завдання в export_jobs
+    # Процеси-обробники: 1 - усе в одному процесі, більше - супервізор розподіляє
+    # оновлення між процесами за user_id (supervisor.py)
+    WORKERS: int = 1
+    WORKER_SHUTDOWN_TIMEOUT: float = 30.0  # с на завершення оновлень у черзі процесу
+    WORKER_QUEUE_SIZE: int = 1000  # оновлень у черзі процесу; повна черга - 429 або пауза polling
+    WORKER_MAX_CONCURRENT_UPDATES: int = 64  # оновлень в обробці одночасно в кожному процесі
+    # Режим отримання оновлень: long polling або webhook (вбудований aiohttp-сервер)
+    RUN_MODE: Literal["polling", "webhook"] = "polling"
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_URL: str | None = None  # публічна адреса для set_webhook; без неї - лише локальний сервер
+    WEBHOOK_SECRET: str | None = None  # X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_MAX_CONNECTIONS: int = 40  # паралельних з'єднань від Telegram (1-100)
+    WEBHOOK_MAX_CONCURRENT_UPDATES: int = 64  # оновлень в обробці одночасно
+    WEBHOOK_MAX_PENDING_UPDATES: int = 1000  # більше прийнятих і не оброблених - 429
     REDIS_URL: str | None = None  # redis://localhost:6379/0 для Redis FSM
+    # Стани FSM у SQLite (якщо REDIS_URL не задано)
+    FSM_STATE_TTL: float = 24 * 3600.0  # с без змін - незавершений діалог скидається
+    FSM_HOT_CACHE_SIZE: int = 10000  # станів у пам'яті (решта читається з БД)
+    FSM_COMPACT_INTERVAL: float = 3600.0  # с між видаленнями застарілих станів
 
 
 # Категорії (не в .env - статичні)
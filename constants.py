@@ -27,6 +27,7 @@ class CallbackData(StrEnum):
     QUICK_CAT_PREFIX = "quick_cat_"
     REPORT_PREFIX = "report_"
     BUDGET_PERIOD_PREFIX = "budget_period_"
+    TRANS_DATE_PREFIX = "trans_date_"
     HISTORY_PAGE_PREFIX = "history_page_"
     DELETE_TRANS_PREFIX = "delete_trans_"
     DELETE_BUDGET_PREFIX = "delete_budget_"
@@ -40,7 +41,18 @@ class CallbackData(StrEnum):
     CHART_EXPENSE_MONTH = "chart_expense_month"
     CHART_INCOME_MONTH = "chart_income_month"
     CHART_DYNAMICS_YEAR = "chart_dynamics_year"
+    CHART_DYNAMICS_PREFIX = "chart_dynamics_"
 
     # Export
     EXPORT_EXCEL = "export_excel"
     EXPORT_CSV = "export_csv"
+
+
+# Вікна графіка динаміки: суфікс callback_data -> (кількість місяців або None - весь час, підпис)
+DYNAMICS_WINDOWS: dict[str, tuple[int | None, str]] = {
+    "3": (3, "3 місяці"),
+    "6": (6, "6 місяців"),
+    "year": (12, "рік"),
+    "24": (24, "2 роки"),
+    "all": (None, "весь час"),
+}
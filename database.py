@@ -1,25 +1,232 @@
+import functools
+import inspect
 import logging
+from collections.abc import Callable
 from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import NamedTuple
 
-import aiosqlite
-
+from cache import MISSING, UserCache
 from config import settings
+from db_pool import ConnectionPool
+from db_writer import WriteQueue
+from rollups import REBUILD_ROLLUPS, ROLLUP_TABLES, ROLLUP_TRIGGERS, rollup_source
+from utils import HISTORY_ANCHOR, HISTORY_NEWER
 
 logger = logging.getLogger(__name__)
 
+_pool: ConnectionPool | None = None
+_writer: WriteQueue | None = None
+
+# Результати читань за (user_id, функція, аргументи); скидаються функціями запису
+read_cache = UserCache(
+    max_entries=settings.READ_CACHE_MAX_ENTRIES,
+    max_bytes=settings.READ_CACHE_MAX_BYTES,
+    ttl=settings.READ_CACHE_TTL,
+)
+
+
+def get_pool() -> ConnectionPool:
+    """Пул з'єднань (створюється при першому зверненні)"""
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(
+            settings.DB_NAME,
+            settings.DB_POOL_SIZE,
+            pragmas={
+                "journal_mode": settings.DB_JOURNAL_MODE,
+                "synchronous": settings.DB_SYNCHRONOUS,
+                "cache_size": settings.DB_CACHE_SIZE,
+                "mmap_size": settings.DB_MMAP_SIZE,
+                "busy_timeout": settings.DB_BUSY_TIMEOUT,
+            },
+            health_check_interval=settings.DB_HEALTH_CHECK_INTERVAL,
+        )
+    return _pool
+
 
 @asynccontextmanager
 async def get_connection():
     """
     Контекстний менеджер для отримання з'єднання з БД.
-    Для SQLite кожен запит створює нове з'єднання (легковагове).
-    При міграції на PostgreSQL можна додати connection pool.
+    З'єднання береться з пулу і повертається в нього після блоку,
+    тож потік aiosqlite та PRAGMA не створюються на кожен запит.
     """
-    async with aiosqlite.connect(settings.DB_NAME) as conn:
+    async with get_pool().acquire() as conn:
         yield conn
 
 
+def get_writer() -> WriteQueue:
+    """Записувач з груповим комітом (запускається при першому записі)"""
+    global _writer
+    if _writer is None:
+        _writer = WriteQueue(
+            get_pool().open_connection,
+            batch_window=settings.DB_WRITE_BATCH_WINDOW_MS / 1000,
+            max_batch=settings.DB_WRITE_MAX_BATCH,
+        )
+    return _writer
+
+
+def _cache_arg(value):
+    # Функції читання використовують лише дату з datetime.now()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def cached_read(error_message: str, fallback: Callable[[], object]):
+    """
+    Кешувати результат функції читання (перший аргумент - user_id) у read_cache.
+    Помилка логується з error_message і повертається fallback(), але не кешується.
+    Закешовані значення спільні для всіх викликів - їх не можна змінювати.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            user_id, *rest = bound.arguments.values()
+            key = (func.__name__, *map(_cache_arg, rest))
+            value = read_cache.get(user_id, key)
+            if value is not MISSING:
+                return value
+
+            generation = read_cache.begin()
+            try:
+                value = await func(*args, **kwargs)
+            except Exception as e:
+                logger.error("%s: %s", error_message, e)
+                return fallback()
+            read_cache.put(user_id, key, value, generation)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+async def check_db_health() -> bool:
+    """Перевірка працездатності з'єднань пулу"""
+    return await get_pool().health_check()
+
+
+async def close_db() -> None:
+    """Дописати чергу записів і закрити пул з'єднань (при зупинці бота)"""
+    global _pool, _writer
+    logger.info("Кеш читань БД: %s", read_cache.stats())
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+# Проєкція балансу: підтримується тригерами в тій самій транзакції, що й запис.
+# data_version зростає при кожній зміні транзакцій користувача (ключ кешів)
+USER_BALANCE_TRIGGERS = (
+    '''
+    CREATE TRIGGER trg_user_balances_insert AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO user_balances (
+            user_id, income_total, expense_total, transaction_count, data_version
+        )
+        VALUES (
+            NEW.user_id,
+            CASE WHEN NEW.type = 'income' THEN NEW.amount ELSE 0 END,
+            CASE WHEN NEW.type = 'expense' THEN NEW.amount ELSE 0 END,
+            1,
+            1
+        )
+        ON CONFLICT(user_id) DO UPDATE SET
+            income_total = income_total + excluded.income_total,
+            expense_total = expense_total + excluded.expense_total,
+            transaction_count = transaction_count + 1,
+            data_version = data_version + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER trg_user_balances_delete AFTER DELETE ON transactions
+    BEGIN
+        UPDATE user_balances SET
+            income_total = income_total - CASE WHEN OLD.type = 'income' THEN OLD.amount ELSE 0 END,
+            expense_total = expense_total - CASE WHEN OLD.type = 'expense' THEN OLD.amount ELSE 0 END,
+            transaction_count = transaction_count - 1,
+            data_version = data_version + 1
+        WHERE user_id = OLD.user_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER trg_user_balances_update
+    AFTER UPDATE OF user_id, type, amount, category, date ON transactions
+    BEGIN
+        UPDATE user_balances SET
+            income_total = income_total - CASE WHEN OLD.type = 'income' THEN OLD.amount ELSE 0 END,
+            expense_total = expense_total - CASE WHEN OLD.type = 'expense' THEN OLD.amount ELSE 0 END,
+            transaction_count = transaction_count - 1,
+            data_version = data_version + 1
+        WHERE user_id = OLD.user_id;
+        INSERT INTO user_balances (
+            user_id, income_total, expense_total, transaction_count, data_version
+        )
+        VALUES (
+            NEW.user_id,
+            CASE WHEN NEW.type = 'income' THEN NEW.amount ELSE 0 END,
+            CASE WHEN NEW.type = 'expense' THEN NEW.amount ELSE 0 END,
+            1,
+            1
+        )
+        ON CONFLICT(user_id) DO UPDATE SET
+            income_total = income_total + excluded.income_total,
+            expense_total = expense_total + excluded.expense_total,
+            transaction_count = transaction_count + 1,
+            data_version = data_version + 1;
+    END
+    ''',
+)
+
+# Upsert, а не перевставка: data_version не повинна повертатися до старих значень
+REBUILD_USER_BALANCES = '''
+    INSERT INTO user_balances (user_id, income_total, expense_total, transaction_count)
+    SELECT
+        user_id,
+        COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0),
+        COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0),
+        COUNT(*)
+    FROM transactions
+    WHERE true
+    GROUP BY user_id
+    ON CONFLICT(user_id) DO UPDATE SET
+        income_total = excluded.income_total,
+        expense_total = excluded.expense_total,
+        transaction_count = excluded.transaction_count
+'''
+
+
+async def _table_exists(db, name: str) -> bool:
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ) as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def _ensure_column(db, table: str, column: str, definition: str) -> None:
+    """Додати колонку до існуючої таблиці (міграція старих БД)"""
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    if column not in columns:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def _recreate_triggers(db, triggers) -> None:
+    """Перестворити тригери, щоб їх визначення завжди відповідали коду"""
+    for trigger_sql in triggers:
+        name = trigger_sql.split("TRIGGER", 1)[1].split()[0]
+        await db.execute(f"DROP TRIGGER IF EXISTS {name}")
+        await db.execute(trigger_sql)
+
+
 async def init_db():
     """Ініціалізація бази даних"""
     try:
@@ -58,6 +265,12 @@ async def init_db():
                 CREATE INDEX IF NOT EXISTS idx_transactions_user_type 
                 ON transactions(user_id, type)
             ''')
+
+            # Keyset-пагінація історії по (date, created_at, id)
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_transactions_user_history
+                ON transactions(user_id, date, created_at)
+            ''')
             
             # Таблиця бюджетів
             await db.execute('''
@@ -72,6 +285,67 @@ async def init_db():
                     UNIQUE(user_id, category, period)
                 )
             ''')
+
+            # Проєкція балансу користувача (O(1) читання замість SUM по історії)
+            balances_exist = await _table_exists(db, "user_balances")
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS user_balances (
+                    user_id INTEGER PRIMARY KEY,
+                    income_total REAL NOT NULL DEFAULT 0,
+                    expense_total REAL NOT NULL DEFAULT 0,
+                    transaction_count INTEGER NOT NULL DEFAULT 0,
+                    data_version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            await _ensure_column(
+                db, "user_balances", "data_version", "INTEGER NOT NULL DEFAULT 0"
+            )
+            await _recreate_triggers(db, USER_BALANCE_TRIGGERS)
+            if not balances_exist:
+                await db.execute(REBUILD_USER_BALANCES)
+
+            # Фонові завдання експорту (export_jobs.py): незавершені переживають перезапуск
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS export_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    chat_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL CHECK(kind IN ('excel', 'csv')),
+                    status TEXT NOT NULL DEFAULT 'queued'
+                        CHECK(status IN ('queued', 'running', 'done', 'failed')),
+                    message_id INTEGER,
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_export_jobs_status
+                ON export_jobs(status)
+            ''')
+
+            # Стани FSM (fsm_storage.SQLiteStorage): незавершені діалоги переживають перезапуск
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS fsm_states (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT NOT NULL DEFAULT '{}',
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_fsm_states_updated
+                ON fsm_states(updated_at)
+            ''')
+
+            # Місячні та денні суми по категоріях для звітів, графіків і бюджетів
+            rollups_exist = await _table_exists(db, "rollup_monthly")
+            for table_sql in ROLLUP_TABLES:
+                await db.execute(table_sql)
+            await _recreate_triggers(db, ROLLUP_TRIGGERS)
+            if not rollups_exist:
+                for rebuild_sql in REBUILD_ROLLUPS:
+                    await db.execute(rebuild_sql)
             
             await db.commit()
     except Exception as e:
@@ -82,30 +356,93 @@ async def init_db():
 async def add_user(user_id: int, username: str = None):
     """Додати користувача"""
     try:
-        async with get_connection() as db:
+        async def op(db):
             await db.execute(
                 'INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)',
                 (user_id, username)
             )
-            await db.commit()
+
+        await get_writer().submit(op)
     except Exception as e:
         logger.error("Помилка додавання користувача: %s", e)
 
 
-async def add_transaction(user_id: int, trans_type: str, amount: float, 
-                         category: str, description: str = None, date: str = None):
-    """Додати транзакцію"""
+class BudgetUsage(NamedTuple):
+    limit: float
+    spent: float
+
+
+class RecordedTransaction(NamedTuple):
+    transaction_id: int
+    income: float
+    expense: float
+    balance: float
+    # Бюджети категорії за поточний місяць/рік (None - бюджету немає або це дохід)
+    month_budget: BudgetUsage | None
+    year_budget: BudgetUsage | None
+
+
+# Бюджети категорії з витратами за поточний місяць і рік (підзапит лише для наявних бюджетів)
+CATEGORY_BUDGET_USAGE = '''
+    SELECT b.period, b.amount,
+           CASE b.period
+               WHEN 'month' THEN (SELECT COALESCE(SUM(total), 0) FROM ({month_source}) WHERE category = b.category)
+               ELSE (SELECT COALESCE(SUM(total), 0) FROM ({year_source}) WHERE category = b.category)
+           END
+    FROM budgets b
+    WHERE b.user_id = ? AND b.category = ?
+'''
+
+
+async def record_transaction(user_id: int, trans_type: str, amount: float, category: str,
+                             description: str = None, date: str = None) -> RecordedTransaction:
+    """
+    Додати транзакцію і в тій самій транзакції SQLite прочитати новий баланс
+    (проєкція user_balances, оновлена тригерами) та використання бюджетів
+    категорії - одна операція записувача замість запису й трьох читань.
+    """
     try:
+        today = datetime.now()
         if date is None:
-            date = datetime.now().strftime('%Y-%m-%d')
-        
-        async with get_connection() as db:
-            await db.execute(
+            date = today.strftime('%Y-%m-%d')
+        today_str = today.strftime('%Y-%m-%d')
+        month_source, month_params = rollup_source(
+            user_id, today.replace(day=1).strftime('%Y-%m-%d'), today_str, 'expense'
+        )
+        year_source, year_params = rollup_source(
+            user_id, today.replace(month=1, day=1).strftime('%Y-%m-%d'), today_str, 'expense'
+        )
+
+        async def op(db):
+            cursor = await db.execute(
                 '''INSERT INTO transactions (user_id, type, amount, category, description, date)
                    VALUES (?, ?, ?, ?, ?, ?)''',
                 (user_id, trans_type, amount, category, description, date)
             )
-            await db.commit()
+            transaction_id = cursor.lastrowid
+            async with db.execute(
+                'SELECT income_total, expense_total FROM user_balances WHERE user_id = ?',
+                (user_id,),
+            ) as cursor:
+                income, expense = await cursor.fetchone() or (0, 0)
+
+            budgets = {}
+            if trans_type == 'expense':
+                async with db.execute(
+                    CATEGORY_BUDGET_USAGE.format(month_source=month_source, year_source=year_source),
+                    (*month_params, *year_params, user_id, category)
+                ) as cursor:
+                    async for period, limit, spent in cursor:
+                        budgets[period] = BudgetUsage(limit, spent)
+
+            return RecordedTransaction(
+                transaction_id, income, expense, income - expense,
+                budgets.get('month'), budgets.get('year'),
+            )
+
+        recorded = await get_writer().submit(op)
+        read_cache.invalidate(user_id)
+        return recorded
     except Exception as e:
         logger.error("Помилка додавання транзакції: %s", e)
         raise
@@ -141,56 +478,117 @@ async def get_transactions(user_id: int, start_date: str = None, end_date: str =
         return []
 
 
+async def iter_transactions(user_id: int, chunk_size: int = 500):
+    """Потоково віддавати всі транзакції користувача пакетами (без fetchall)"""
+    async with get_connection() as db:
+        async with db.execute(
+            'SELECT * FROM transactions WHERE user_id = ? ORDER BY date DESC, created_at DESC',
+            (user_id,)
+        ) as cursor:
+            while rows := await cursor.fetchmany(chunk_size):
+                yield rows
+
+
+@cached_read("Помилка отримання балансу", lambda: (0, 0, 0))
 async def get_balance(user_id: int):
-    """Отримати баланс користувача (один запит)"""
-    try:
-        async with get_connection() as db:
-            async with db.execute(
-                """SELECT
-                    COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0),
-                    COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0)
-                FROM transactions WHERE user_id = ?""",
-                (user_id,),
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    total_income, total_expense = row[0], row[1]
-                    return total_income, total_expense, total_income - total_expense
-            return 0, 0, 0
-    except Exception as e:
-        logger.error("Помилка отримання балансу: %s", e)
+    """Отримати баланс користувача (читання проєкції user_balances за ключем)"""
+    async with get_connection() as db:
+        async with db.execute(
+            'SELECT income_total, expense_total FROM user_balances WHERE user_id = ?',
+            (user_id,),
+        ) as cursor:
+            row = await cursor.fetchone()
+            if row:
+                total_income, total_expense = row[0], row[1]
+                return total_income, total_expense, total_income - total_expense
         return 0, 0, 0
 
 
+@cached_read("Помилка отримання кількості транзакцій", lambda: 0)
+async def get_transaction_count(user_id: int) -> int:
+    """Кількість транзакцій користувача (з проєкції user_balances)"""
+    async with get_connection() as db:
+        async with db.execute(
+            'SELECT transaction_count FROM user_balances WHERE user_id = ?',
+            (user_id,),
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
+
+@cached_read("Помилка отримання версії даних", lambda: -1)
+async def get_data_version(user_id: int) -> int:
+    """Версія даних користувача (зростає при кожному додаванні/видаленні транзакції)"""
+    async with get_connection() as db:
+        async with db.execute(
+            'SELECT data_version FROM user_balances WHERE user_id = ?',
+            (user_id,),
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
+
+@cached_read("Помилка отримання підсумку", list)
 async def get_category_summary(user_id: int, start_date: str, end_date: str, trans_type: str):
-    """Отримати підсумок по категоріях"""
-    try:
-        async with get_connection() as db:
-            async with db.execute(
-                '''SELECT category, SUM(amount) as total, COUNT(*) as count
-                   FROM transactions 
-                   WHERE user_id = ? AND type = ? AND date BETWEEN ? AND ?
-                   GROUP BY category
-                   ORDER BY total DESC''',
-                (user_id, trans_type, start_date, end_date)
-            ) as cursor:
-                rows = await cursor.fetchall()
-                return rows
-    except Exception as e:
-        logger.error("Помилка отримання підсумку: %s", e)
-        return []
+    """Отримати підсумок по категоріях (з rollup-таблиць)"""
+    source, params = rollup_source(user_id, start_date, end_date, trans_type)
+    async with get_connection() as db:
+        async with db.execute(
+            f'''SELECT category, SUM(total) as total, SUM(count) as count
+               FROM ({source})
+               GROUP BY category
+               ORDER BY total DESC''',
+            params
+        ) as cursor:
+            rows = await cursor.fetchall()
+            return rows
+
+
+@cached_read("Помилка отримання підсумку за період", list)
+async def get_period_summary(user_id: int, start_date: str, end_date: str):
+    """
+    Підсумок за період одним груповим проходом по rollup-таблицях (обидва типи):
+    [(type, category, total, count), ...], у межах типу - за спаданням суми
+    """
+    source, params = rollup_source(user_id, start_date, end_date)
+    async with get_connection() as db:
+        async with db.execute(
+            f'''SELECT type, category, SUM(total) as total, SUM(count) as count
+               FROM ({source})
+               GROUP BY type, category
+               ORDER BY type, total DESC''',
+            params
+        ) as cursor:
+            return await cursor.fetchall()
+
+
+@cached_read("Помилка отримання місячних сум", list)
+async def get_monthly_totals(user_id: int, start_date: str, end_date: str):
+    """Отримати суми доходів/витрат по місяцях: [(month, type, total), ...]"""
+    source, params = rollup_source(user_id, start_date, end_date)
+    async with get_connection() as db:
+        async with db.execute(
+            f'''SELECT month, type, SUM(total)
+               FROM ({source})
+               GROUP BY month, type
+               ORDER BY month''',
+            params
+        ) as cursor:
+            return await cursor.fetchall()
 
 
 async def set_budget(user_id: int, category: str, amount: float, period: str):
     """Встановити бюджет"""
     try:
-        async with get_connection() as db:
+        async def op(db):
             await db.execute(
                 '''INSERT OR REPLACE INTO budgets (user_id, category, amount, period)
                    VALUES (?, ?, ?, ?)''',
                 (user_id, category, amount, period)
             )
-            await db.commit()
+
+        await get_writer().submit(op)
+        read_cache.invalidate(user_id)
     except Exception as e:
         logger.error("Помилка встановлення бюджету: %s", e)
         raise
@@ -217,46 +615,50 @@ async def get_budgets(user_id: int, period: str = None):
         return []
 
 
-async def check_budget(user_id: int, category: str, period: str, start_date: str, end_date: str):
-    """Перевірити виконання бюджету"""
-    try:
-        async with get_connection() as db:
-            # Отримати бюджет
-            async with db.execute(
-                'SELECT amount FROM budgets WHERE user_id = ? AND category = ? AND period = ?',
-                (user_id, category, period)
-            ) as cursor:
-                budget_row = await cursor.fetchone()
-                if not budget_row:
-                    return None, None
-                budget_amount = budget_row[0]
-            
-            # Отримати витрати
-            async with db.execute(
-                '''SELECT COALESCE(SUM(amount), 0) FROM transactions 
-                   WHERE user_id = ? AND category = ? AND type = "expense" 
-                   AND date BETWEEN ? AND ?''',
-                (user_id, category, start_date, end_date)
-            ) as cursor:
-                spent_row = await cursor.fetchone()
-                spent_amount = spent_row[0] if spent_row else 0
-            
-            return budget_amount, spent_amount
-    except Exception as e:
-        logger.error("Помилка перевірки бюджету: %s", e)
-        return None, None
+@cached_read("Помилка отримання стану бюджетів", list)
+async def get_budget_statuses(user_id: int, today: datetime):
+    """
+    Всі бюджети користувача з витратами за поточний місяць/рік одним запитом:
+    [(id, user_id, category, amount, period, spent), ...]
+    """
+    today_str = today.strftime('%Y-%m-%d')
+    month_source, month_params = rollup_source(
+        user_id, today.replace(day=1).strftime('%Y-%m-%d'), today_str, 'expense'
+    )
+    year_source, year_params = rollup_source(
+        user_id, today.replace(month=1, day=1).strftime('%Y-%m-%d'), today_str, 'expense'
+    )
+    async with get_connection() as db:
+        async with db.execute(
+            f'''SELECT b.id, b.user_id, b.category, b.amount, b.period,
+                      COALESCE(s.spent, 0)
+               FROM budgets b
+               LEFT JOIN (
+                   SELECT 'month' AS period, category, SUM(total) AS spent
+                   FROM ({month_source}) GROUP BY category
+                   UNION ALL
+                   SELECT 'year' AS period, category, SUM(total) AS spent
+                   FROM ({year_source}) GROUP BY category
+               ) s ON s.period = b.period AND s.category = b.category
+               WHERE b.user_id = ?
+               ORDER BY b.id''',
+            (*month_params, *year_params, user_id)
+        ) as cursor:
+            return await cursor.fetchall()
 
 
 async def delete_transaction(transaction_id: int, user_id: int):
     """Видалити транзакцію"""
     try:
-        async with get_connection() as db:
+        async def op(db):
             await db.execute(
                 'DELETE FROM transactions WHERE id = ? AND user_id = ?',
                 (transaction_id, user_id)
             )
-            await db.commit()
-            return True
+
+        await get_writer().submit(op)
+        read_cache.invalidate(user_id)
+        return True
     except Exception as e:
         logger.error("Помилка видалення транзакції: %s", e)
         return False
@@ -265,41 +667,195 @@ async def delete_transaction(transaction_id: int, user_id: int):
 async def delete_budget(budget_id: int, user_id: int):
     """Видалити бюджет"""
     try:
-        async with get_connection() as db:
+        async def op(db):
             await db.execute(
                 'DELETE FROM budgets WHERE id = ? AND user_id = ?',
                 (budget_id, user_id)
             )
-            await db.commit()
-            return True
+
+        await get_writer().submit(op)
+        read_cache.invalidate(user_id)
+        return True
     except Exception as e:
         logger.error("Помилка видалення бюджету: %s", e)
         return False
 
 
-async def get_recent_transactions(user_id: int, limit: int = 10, offset: int = 0):
-    """Отримати останні транзакції з пагінацією"""
+async def create_export_job(user_id: int, chat_id: int, kind: str, message_id: int | None) -> int:
+    """Записати нове завдання експорту в статусі queued, повертає його id"""
+    try:
+        async def op(db):
+            cursor = await db.execute(
+                '''INSERT INTO export_jobs (user_id, chat_id, kind, message_id)
+                   VALUES (?, ?, ?, ?)''',
+                (user_id, chat_id, kind, message_id)
+            )
+            return cursor.lastrowid
+
+        return await get_writer().submit(op)
+    except Exception as e:
+        logger.error("Помилка створення завдання експорту: %s", e)
+        raise
+
+
+async def set_export_job_status(job_id: int, status: str, error: str = None) -> None:
+    """Оновити статус завдання експорту"""
+    try:
+        async def op(db):
+            await db.execute(
+                '''UPDATE export_jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?''',
+                (status, error, job_id)
+            )
+
+        await get_writer().submit(op)
+    except Exception as e:
+        logger.error("Помилка оновлення завдання експорту: %s", e)
+
+
+async def get_unfinished_export_jobs():
+    """Завдання, що не завершилися до зупинки бота: (id, user_id, chat_id, kind, message_id)"""
     try:
         async with get_connection() as db:
-            # Отримати транзакції
             async with db.execute(
-                '''SELECT * FROM transactions 
-                   WHERE user_id = ? 
-                   ORDER BY date DESC, created_at DESC 
-                   LIMIT ? OFFSET ?''',
-                (user_id, limit, offset)
+                '''SELECT id, user_id, chat_id, kind, message_id FROM export_jobs
+                   WHERE status IN ('queued', 'running')
+                   ORDER BY id'''
             ) as cursor:
-                transactions = await cursor.fetchall()
-            
-            # Отримати загальну кількість
+                return await cursor.fetchall()
+    except Exception as e:
+        logger.error("Помилка отримання завдань експорту: %s", e)
+        return []
+
+
+async def purge_export_jobs(keep_days: int) -> None:
+    """Видалити завершені завдання експорту, старші за keep_days днів"""
+    try:
+        async def op(db):
+            await db.execute(
+                '''DELETE FROM export_jobs
+                   WHERE status IN ('done', 'failed') AND updated_at < datetime('now', ?)''',
+                (f'-{keep_days} days',)
+            )
+
+        await get_writer().submit(op)
+    except Exception as e:
+        logger.error("Помилка очищення завдань експорту: %s", e)
+
+
+async def load_fsm_record(key: str):
+    """Стан FSM за ключем: (state, data JSON, updated_at) або None"""
+    try:
+        async with get_connection() as db:
             async with db.execute(
-                'SELECT COUNT(*) FROM transactions WHERE user_id = ?',
-                (user_id,)
+                'SELECT state, data, updated_at FROM fsm_states WHERE key = ?',
+                (key,)
             ) as cursor:
-                total = await cursor.fetchone()
-                total_count = total[0] if total else 0
-            
-            return transactions, total_count
+                return await cursor.fetchone()
     except Exception as e:
-        logger.error("Помилка отримання транзакцій: %s", e)
-        return [], 0
+        logger.error("Помилка читання стану FSM: %s", e)
+        return None
+
+
+async def save_fsm_record(key: str, state: str | None, data: str, updated_at: float) -> None:
+    """Записати стан FSM (порожній стан без даних - видалити запис)"""
+    try:
+        async def op(db):
+            if state is None and data == '{}':
+                await db.execute('DELETE FROM fsm_states WHERE key = ?', (key,))
+                return
+            await db.execute(
+                '''INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET
+                       state = excluded.state, data = excluded.data, updated_at = excluded.updated_at''',
+                (key, state, data, updated_at)
+            )
+
+        await get_writer().submit(op)
+    except Exception as e:
+        logger.error("Помилка збереження стану FSM: %s", e)
+
+
+async def purge_fsm_records(before: float) -> int:
+    """Видалити стани FSM, не змінені з моменту before (unix time); повертає кількість"""
+    try:
+        async def op(db):
+            cursor = await db.execute('DELETE FROM fsm_states WHERE updated_at < ?', (before,))
+            return cursor.rowcount
+
+        return await get_writer().submit(op)
+    except Exception as e:
+        logger.error("Помилка очищення станів FSM: %s", e)
+        return 0
+
+
+@cached_read("Помилка отримання транзакцій", lambda: ([], 0))
+async def get_history_page(user_id: int, limit: int = 10, cursor=None):
+    """
+    Сторінка історії з keyset-пагінацією по (date, created_at, id).
+    cursor - (напрям, (date, created_at, id)) з utils.parse_history_cursor або None
+    для першої сторінки. Загальна кількість береться з user_balances.
+    """
+    query = 'SELECT * FROM transactions WHERE user_id = ?'
+    params: list = [user_id]
+    order = 'DESC'
+    if cursor:
+        direction, key = cursor
+        if direction == HISTORY_NEWER:
+            query += ' AND (date, created_at, id) > (?, ?, ?)'
+            order = 'ASC'
+        elif direction == HISTORY_ANCHOR:
+            query += ' AND (date, created_at, id) <= (?, ?, ?)'
+        else:
+            query += ' AND (date, created_at, id) < (?, ?, ?)'
+        params += list(key)
+    query += f' ORDER BY date {order}, created_at {order}, id {order} LIMIT ?'
+    params.append(limit)
+
+    async with get_connection() as db:
+        async with db.execute(query, params) as cursor_:
+            transactions = await cursor_.fetchall()
+        if order == 'ASC':
+            transactions.reverse()
+
+        async with db.execute(
+            'SELECT transaction_count FROM user_balances WHERE user_id = ?',
+            (user_id,)
+        ) as cursor_:
+            total = await cursor_.fetchone()
+            total_count = total[0] if total else 0
+
+        return transactions, total_count
+
+
+async def rebuild_user_balances() -> int:
+    """Перебудувати user_balances з таблиці transactions; повертає кількість користувачів"""
+    async def op(db):
+        await db.execute(
+            '''UPDATE user_balances SET income_total = 0, expense_total = 0,
+                   transaction_count = 0, data_version = data_version + 1'''
+        )
+        cursor = await db.execute(REBUILD_USER_BALANCES)
+        return cursor.rowcount
+
+    rows = await get_writer().submit(op)
+    read_cache.clear()
+    return rows
+
+
+async def rebuild_rollups() -> int:
+    """Перебудувати rollup_monthly та rollup_daily з таблиці transactions"""
+    async def op(db):
+        await db.execute('DELETE FROM rollup_monthly')
+        await db.execute('DELETE FROM rollup_daily')
+        # Закешовані графіки побудовані зі старих rollup-сум
+        await db.execute('UPDATE user_balances SET data_version = data_version + 1')
+        rows = 0
+        for rebuild_sql in REBUILD_ROLLUPS:
+            cursor = await db.execute(rebuild_sql)
+            rows += cursor.rowcount
+        return rows
+
+    rows = await get_writer().submit(op)
+    read_cache.clear()
+    return rows
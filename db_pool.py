@@ -0,0 +1,156 @@
+"""Пул постійних з'єднань SQLite"""
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+
+class PoolClosedError(RuntimeError):
+    """Спроба отримати з'єднання із закритого пулу"""
+
+
+class ConnectionPool:
+    """
+    Пул з'єднань aiosqlite.
+    Кожне з'єднання - окремий фоновий потік, тому вони створюються ліниво
+    (не більше size), налаштовуються PRAGMA один раз і перевикористовуються.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        size: int = 4,
+        *,
+        pragmas: dict[str, str | int] | None = None,
+        health_check_interval: float = 60.0,
+    ) -> None:
+        if size < 1:
+            raise ValueError("Розмір пулу має бути не менше 1")
+        self.database = database
+        self.size = size
+        self.pragmas = pragmas or {}
+        self.health_check_interval = health_check_interval
+        self._idle: list[tuple[aiosqlite.Connection, float]] = []
+        self._slots = asyncio.Semaphore(size)
+        self._created = 0
+        self._closed = False
+
+    @property
+    def created(self) -> int:
+        """Кількість відкритих з'єднань"""
+        return self._created
+
+    @property
+    def idle(self) -> int:
+        """Кількість вільних з'єднань"""
+        return len(self._idle)
+
+    async def _connect(self) -> aiosqlite.Connection:
+        """Відкрити нове з'єднання та застосувати PRAGMA"""
+        conn = await aiosqlite.connect(self.database)
+        try:
+            for name, value in self.pragmas.items():
+                await conn.execute(f"PRAGMA {name} = {value}")
+        except Exception:
+            await conn.close()
+            raise
+        return conn
+
+    async def open_connection(self) -> aiosqlite.Connection:
+        """Окреме з'єднання поза пулом з тими ж PRAGMA (напр. для записувача)"""
+        return await self._connect()
+
+    async def _discard(self, conn: aiosqlite.Connection) -> None:
+        """Закрити з'єднання"""
+        self._created -= 1
+        try:
+            await conn.close()
+        except Exception as e:
+            logger.warning("Помилка закриття з'єднання: %s", e)
+
+    async def _is_alive(self, conn: aiosqlite.Connection) -> bool:
+        try:
+            async with conn.execute("SELECT 1") as cursor:
+                await cursor.fetchone()
+            return True
+        except Exception as e:
+            logger.warning("З'єднання з БД не пройшло перевірку: %s", e)
+            return False
+
+    async def _get(self) -> aiosqlite.Connection:
+        """Взяти вільне з'єднання або відкрити нове (слот уже зайнято)"""
+        while self._idle:
+            conn, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self.health_check_interval:
+                return conn
+            if await self._is_alive(conn):
+                return conn
+            await self._discard(conn)
+        conn = await self._connect()
+        self._created += 1
+        return conn
+
+    async def _release(self, conn: aiosqlite.Connection) -> None:
+        if self._closed:
+            await self._discard(conn)
+            return
+        try:
+            # Незакомічені зміни не повинні потрапити до наступного користувача
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception as e:
+            logger.warning("Не вдалося відкотити транзакцію, з'єднання закрито: %s", e)
+            await self._discard(conn)
+            return
+        self._idle.append((conn, time.monotonic()))
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Отримати з'єднання з пулу на час блоку"""
+        if self._closed:
+            raise PoolClosedError("Пул з'єднань закрито")
+        await self._slots.acquire()
+        try:
+            conn = await self._get()
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            yield conn
+        finally:
+            try:
+                await self._release(conn)
+            finally:
+                self._slots.release()
+
+    async def health_check(self) -> bool:
+        """Перевірити вільні з'єднання; непрацюючі закриваються"""
+        if self._closed:
+            return False
+        healthy = True
+        idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            if await self._is_alive(conn):
+                self._idle.append((conn, time.monotonic()))
+            else:
+                healthy = False
+                await self._discard(conn)
+        try:
+            async with self.acquire() as conn:
+                healthy = await self._is_alive(conn) and healthy
+        except Exception as e:
+            logger.error("Пул з'єднань недоступний: %s", e)
+            return False
+        return healthy
+
+    async def close(self) -> None:
+        """Закрити всі вільні з'єднання; зайняті закриються при поверненні"""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            await self._discard(conn)
@@ -0,0 +1,152 @@
+"""Єдиний записувач SQLite з груповим комітом"""
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[T]]
+
+_STOP = object()
+
+
+class WriterStoppedError(RuntimeError):
+    """Запис після зупинки записувача"""
+
+
+class WriteQueue:
+    """
+    Черга операцій запису, що виконуються одним фоновим завданням.
+    Все, що надійшло за batch_window, виконується в одній транзакції SQLite
+    (кожна операція - у власному SAVEPOINT) з одним комітом; кожен виклик
+    отримує свій результат або свою помилку.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[aiosqlite.Connection]],
+        *,
+        batch_window: float = 0.002,
+        max_batch: int = 256,
+    ) -> None:
+        self._connect = connect
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[Any] = asyncio.Queue()
+        self._conn: aiosqlite.Connection | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._stopping = False
+        self.batches = 0
+        self.operations = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Запустити фонове завдання записувача"""
+        if self._stopping:
+            raise WriterStoppedError("Записувач зупинено")
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="db-writer")
+
+    async def submit(self, op: WriteOp[T]) -> T:
+        """Поставити операцію в чергу та дочекатися її коміту"""
+        self.start()
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future))
+        return await future
+
+    async def stop(self) -> None:
+        """Виконати все, що вже в черзі, і закрити з'єднання"""
+        self._stopping = True
+        if self.running:
+            self._queue.put_nowait(_STOP)
+            await self._task
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _drain(self, batch: list[tuple[WriteOp[Any], asyncio.Future[Any]]]) -> bool:
+        """Забрати з черги все, що вже надійшло; True - отримано сигнал зупинки"""
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if item is _STOP:
+                return True
+            batch.append(item)
+        return False
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = self._drain(batch)
+            if not stop and self.batch_window > 0 and len(batch) < self.max_batch:
+                await asyncio.sleep(self.batch_window)
+                stop = self._drain(batch)
+            await self._execute(batch)
+            if stop:
+                return
+
+    async def _execute(self, batch: list[tuple[WriteOp[Any], asyncio.Future[Any]]]) -> None:
+        outcomes: list[tuple[asyncio.Future[Any], BaseException | None, Any]] = []
+        try:
+            if self._conn is None:
+                self._conn = await self._connect()
+            conn = self._conn
+            await conn.execute("BEGIN IMMEDIATE")
+            for op, future in batch:
+                if future.done():
+                    continue
+                await conn.execute("SAVEPOINT write_op")
+                try:
+                    result = await op(conn)
+                except Exception as e:
+                    await conn.execute("ROLLBACK TO write_op")
+                    await conn.execute("RELEASE write_op")
+                    outcomes.append((future, e, None))
+                else:
+                    await conn.execute("RELEASE write_op")
+                    outcomes.append((future, None, result))
+            await conn.commit()
+        except Exception as e:
+            logger.error("Помилка групового запису в БД: %s", e)
+            await self._reset()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(outcomes)
+        for future, error, result in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def _reset(self) -> None:
+        """Відкотити незавершену транзакцію; при невдачі - перевідкрити з'єднання"""
+        if self._conn is None:
+            return
+        try:
+            if self._conn.in_transaction:
+                await self._conn.rollback()
+        except Exception as e:
+            logger.warning("Записувач перевідкриває з'єднання: %s", e)
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
@@ -0,0 +1,262 @@
+"""Фонова черга експорту: обмежена кількість воркерів, стан у SQLite, прогрес і доставка"""
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+
+from config import settings
+from constants import CallbackData
+from database import (
+    create_export_job,
+    get_transaction_count,
+    get_unfinished_export_jobs,
+    purge_export_jobs,
+    set_export_job_status,
+)
+from keyboards import export_menu_kb
+from reports import artifact_key, export_to_csv, export_to_excel
+from services import FileObjectInputFile, telegram_file_ids
+
+logger = logging.getLogger(__name__)
+
+# Формат: (функція експорту, розширення, назва, callback_data - вид для artifact_key)
+EXPORT_FORMATS = {
+    "excel": (export_to_excel, "xlsx", "Excel", CallbackData.EXPORT_EXCEL.value),
+    "csv": (export_to_csv, "csv", "CSV", CallbackData.EXPORT_CSV.value),
+}
+
+NO_DATA_TEXT = "Немає даних для експорту.\nДодайте транзакції, щоб експортувати дані."
+FAILED_TEXT = "Помилка експорту даних. Спробуйте пізніше."
+
+
+class ExportQueueFullError(RuntimeError):
+    """Черга експорту переповнена"""
+
+
+async def export_artifact_key(user_id: int, kind: str):
+    """Ключ file_id готового файлу експорту (той самий, що й для answer_cached_media)"""
+    return await artifact_key(user_id, EXPORT_FORMATS[kind][3])
+
+
+@dataclass(slots=True)
+class ExportJob:
+    id: int
+    user_id: int
+    chat_id: int
+    kind: str
+    message_id: int | None = None
+    rows_done: int = 0
+    rows_total: int = 0
+    started: bool = False
+
+    def advance(self, rows: int) -> None:
+        """Колбек прогресу експорту (може викликатися з потоку Excel)"""
+        self.rows_done = rows
+
+    def progress_text(self) -> str:
+        label = EXPORT_FORMATS[self.kind][2]
+        if not self.started:
+            return f"⏳ Експорт {label}: у черзі..."
+        if not self.rows_done:
+            return f"⏳ Експорт {label}: готую файл..."
+        if self.rows_total:
+            percent = min(100, self.rows_done * 100 // self.rows_total)
+            return f"⏳ Експорт {label}: {self.rows_done} з {self.rows_total} рядків ({percent}%)"
+        return f"⏳ Експорт {label}: {self.rows_done} рядків"
+
+
+class ExportJobQueue:
+    """
+    Черга експорту з фіксованою кількістю воркерів.
+
+    Обробник кнопки лише ставить завдання (повідомлення прогресу + рядок у
+    export_jobs) і одразу відповідає, тож довгий експорт не тримає оновлення.
+    Воркер будує файл, періодично редагує повідомлення прогресу і надсилає
+    документ. Повторний запит того ж формату, поки завдання не завершене,
+    повертає наявне; незавершені завдання відновлюються при старті.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queued: int = 50,
+        progress_interval: float = 3.0,
+    ) -> None:
+        self.workers = workers
+        self.max_queued = max_queued
+        self.progress_interval = progress_interval
+        self._bot: Bot | None = None
+        self._queue: asyncio.Queue[ExportJob] = asyncio.Queue()
+        self._active: dict[tuple[int, str], ExportJob] = {}
+        self._tasks: list[asyncio.Task[None]] = []
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        """Кількість завдань у черзі (без тих, що вже виконуються)"""
+        return self._queue.qsize()
+
+    async def start(self, bot: Bot, owns: Callable[[int], bool] | None = None) -> None:
+        """
+        Відновити незавершені завдання та запустити воркерів.
+        owns(user_id) - чи відновлювати завдання користувача в цьому процесі
+        (при кількох процесах кожен бере лише своїх користувачів).
+        """
+        self._bot = bot
+        await purge_export_jobs(settings.EXPORT_JOBS_KEEP_DAYS)
+        restored = 0
+        for job_id, user_id, chat_id, kind, message_id in await get_unfinished_export_jobs():
+            if owns is not None and not owns(user_id):
+                continue
+            job = ExportJob(job_id, user_id, chat_id, kind, message_id)
+            if (user_id, kind) in self._active:
+                await set_export_job_status(job_id, "failed", "дублікат")
+                continue
+            self._active[(user_id, kind)] = job
+            self._queue.put_nowait(job)
+            restored += 1
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"export-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Черга експорту запущена: %s воркерів, відновлено %s завдань", self.workers, restored)
+
+    async def stop(self) -> None:
+        """Зупинити воркерів; завдання в роботі лишаються в БД і продовжаться після старту"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, user_id: int, chat_id: int, kind: str) -> tuple[ExportJob, bool]:
+        """
+        Поставити експорт у чергу: (завдання, чи створене нове).
+        ExportQueueFullError - у черзі вже max_queued завдань.
+        """
+        key = (user_id, kind)
+        if (job := self._active.get(key)) is not None:
+            return job, False
+        if self._queue.qsize() >= self.max_queued:
+            raise ExportQueueFullError("Забагато експортів у черзі")
+
+        # Резервуємо місце до await, щоб одночасний дубль отримав це ж завдання
+        job = self._active[key] = ExportJob(0, user_id, chat_id, kind)
+        try:
+            message = await self._bot.send_message(chat_id, job.progress_text())
+            job.message_id = message.message_id
+            job.id = await create_export_job(user_id, chat_id, kind, job.message_id)
+        except BaseException:
+            del self._active[key]
+            raise
+        self._queue.put_nowait(job)
+        return job, True
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Помилка експорту %s (завдання %s): %s", job.kind, job.id, e)
+                await set_export_job_status(job.id, "failed", str(e))
+                await self._edit(job, FAILED_TEXT)
+            finally:
+                self._active.pop((job.user_id, job.kind), None)
+                self._queue.task_done()
+
+    async def _run(self, job: ExportJob) -> None:
+        exporter, extension, label, _ = EXPORT_FORMATS[job.kind]
+        job.started = True
+        await set_export_job_status(job.id, "running")
+        job.rows_total = await get_transaction_count(job.user_id)
+        key = await export_artifact_key(job.user_id, job.kind)
+
+        progress = asyncio.create_task(self._report_progress(job))
+        try:
+            export_file = await exporter(job.user_id, progress=job.advance)
+        finally:
+            progress.cancel()
+
+        if export_file is None:
+            if job.rows_total:
+                raise RuntimeError("експорт не повернув файл")
+            await set_export_job_status(job.id, "done")
+            await self._edit(job, NO_DATA_TEXT)
+            return
+
+        try:
+            sent = await self._bot.send_document(
+                job.chat_id,
+                FileObjectInputFile(
+                    export_file,
+                    filename=f"finance_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                ),
+                caption=f"Ваші фінансові дані в форматі {label}",
+                reply_markup=export_menu_kb(),
+            )
+        finally:
+            export_file.close()
+        if key is not None and sent.document is not None:
+            telegram_file_ids.put(key, sent.document.file_id)
+
+        self.completed += 1
+        await set_export_job_status(job.id, "done")
+        await self._delete_progress(job)
+
+    async def _report_progress(self, job: ExportJob) -> None:
+        shown = None
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            text = job.progress_text()
+            if text != shown:
+                await self._edit(job, text, with_menu=False)
+                shown = text
+
+    async def _edit(self, job: ExportJob, text: str, with_menu: bool = True) -> None:
+        if job.message_id is None:
+            return
+        try:
+            await self._bot.edit_message_text(
+                text,
+                chat_id=job.chat_id,
+                message_id=job.message_id,
+                reply_markup=export_menu_kb() if with_menu else None,
+            )
+        except TelegramAPIError as e:
+            logger.debug("Не вдалося оновити прогрес експорту: %s", e)
+
+    async def _delete_progress(self, job: ExportJob) -> None:
+        if job.message_id is None:
+            return
+        try:
+            await self._bot.delete_message(job.chat_id, job.message_id)
+        except TelegramAPIError as e:
+            logger.debug("Не вдалося видалити повідомлення прогресу: %s", e)
+
+
+_queue: ExportJobQueue | None = None
+
+
+def get_export_queue() -> ExportJobQueue:
+    """Черга експорту (створюється при першому зверненні)"""
+    global _queue
+    if _queue is None:
+        _queue = ExportJobQueue(
+            workers=settings.EXPORT_WORKERS,
+            max_queued=settings.EXPORT_QUEUE_SIZE,
+            progress_interval=settings.EXPORT_PROGRESS_INTERVAL,
+        )
+    return _queue
+
+
+async def shutdown_export_queue() -> None:
+    global _queue
+    if _queue is not None:
+        await _queue.stop()
+        _queue = None
@@ -0,0 +1,147 @@
+"""Сховище станів FSM у SQLite з гарячим шаром у пам'яті"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from typing import Any
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+
+from database import load_fsm_record, purge_fsm_records, save_fsm_record
+
+logger = logging.getLogger(__name__)
+
+
+class _Record:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: str | None = None, data: dict[str, Any] | None = None, updated_at: float = 0.0) -> None:
+        self.state = state
+        self.data = data if data is not None else {}
+        self.updated_at = updated_at
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM storage у таблиці fsm_states бази бота.
+
+    Запис наскрізний: стан оновлюється в пам'яті й одразу пишеться через
+    записувач з груповим комітом, тож незавершені діалоги переживають
+    перезапуск. Читання йдуть з LRU гарячого шару (включно з відсутніми
+    станами - більшість оновлень приходить від користувачів поза діалогом),
+    промах читає один рядок з БД. Стан, не змінений за ttl секунд, вважається
+    покинутим: при читанні він порожній, а періодична компактизація видаляє
+    такі рядки з таблиці та гарячого шару.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 24 * 3600.0,
+        hot_size: int = 10000,
+        compact_interval: float = 3600.0,
+        key_builder: KeyBuilder | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.hot_size = hot_size
+        self.compact_interval = compact_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._clock = clock
+        self._hot: OrderedDict[str, _Record] = OrderedDict()
+        self._compaction: asyncio.Task[None] | None = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    async def _record(self, key: StorageKey) -> tuple[str, _Record]:
+        if self._compaction is None:
+            self._compaction = asyncio.create_task(self._compact_periodically(), name="fsm-compaction")
+
+        storage_key = self.key_builder.build(key)
+        record = self._hot.get(storage_key)
+        if record is not None:
+            self.hits += 1
+            self._hot.move_to_end(storage_key)
+        else:
+            self.misses += 1
+            row = await load_fsm_record(storage_key)
+            loaded = _Record(row[0], json.loads(row[1]), row[2]) if row else _Record()
+            # За час читання запис міг з'явитися з іншої корутини - лишаємо його
+            record = self._hot.setdefault(storage_key, loaded)
+            while len(self._hot) > self.hot_size:
+                self._hot.popitem(last=False)
+
+        if not record.empty and self._clock() - record.updated_at > self.ttl:
+            self.expired += 1
+            record.state, record.data = None, {}
+        return storage_key, record
+
+    async def _save(self, storage_key: str, record: _Record) -> None:
+        record.updated_at = self._clock()
+        await save_fsm_record(
+            storage_key,
+            record.state,
+            json.dumps(record.data, ensure_ascii=False),
+            record.updated_at,
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key, record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        await self._save(storage_key, record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        storage_key, record = await self._record(key)
+        record.data = data.copy()
+        await self._save(storage_key, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, record = await self._record(key)
+        return record.data.copy()
+
+    async def compact(self) -> int:
+        """Видалити застарілі стани з таблиці та гарячого шару, повертає кількість рядків"""
+        cutoff = self._clock() - self.ttl
+        removed = await purge_fsm_records(cutoff)
+        stale = [k for k, record in self._hot.items() if not record.empty and record.updated_at < cutoff]
+        for storage_key in stale:
+            del self._hot[storage_key]
+        if removed or stale:
+            logger.info("Компактизація FSM: видалено %s станів з БД, %s з пам'яті", removed, len(stale))
+        return removed
+
+    async def _compact_periodically(self) -> None:
+        while True:
+            await self.compact()
+            await asyncio.sleep(self.compact_interval)
+
+    def stats(self) -> dict[str, Any]:
+        return {"items": len(self._hot), "hits": self.hits, "misses": self.misses, "expired": self.expired}
+
+    async def close(self) -> None:
+        if self._compaction is not None:
+            self._compaction.cancel()
+            await asyncio.gather(self._compaction, return_exceptions=True)
+            self._compaction = None
+        logger.info("FSM storage: %s", self.stats())
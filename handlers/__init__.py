@@ -1,21 +1,18 @@
 """Реєстрація всіх обробників"""
 from aiogram import Dispatcher
 
+from callback_dispatch import callbacks
+
+# Модулі лише з callback-кнопками реєструють маршрути в callbacks при імпорті
+from . import export, history, navigation, reports  # noqa: F401
 from .start import router as start_router
 from .budgets import router as budgets_router
 from .transactions import router as transactions_router
-from .reports import router as reports_router
-from .history import router as history_router
-from .export import router as export_router
-from .navigation import router as navigation_router
 
 
 def register_handlers(dp: Dispatcher) -> None:
-    """Підключає всі роутери"""
+    """Підключає роутери повідомлень і єдиний роутер callback-кнопок"""
     dp.include_router(start_router)
     dp.include_router(budgets_router)
     dp.include_router(transactions_router)
-    dp.include_router(reports_router)
-    dp.include_router(history_router)
-    dp.include_router(export_router)
-    dp.include_router(navigation_router)
+    dp.include_router(callbacks.as_router())
@@ -1,11 +1,14 @@
 """Обробники бюджетів"""
 import logging
+from datetime import datetime
 
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
-from database import check_budget, get_budgets, set_budget, delete_budget
+from callback_dispatch import callbacks, int_arg, str_arg
+from constants import CallbackData
+from database import delete_budget, get_budget_statuses, set_budget
 from keyboards import (
     budget_list_kb,
     budget_menu_kb,
@@ -21,7 +24,7 @@ logger = logging.getLogger(__name__)
 router = Router(name="budgets")
 
 
-@router.callback_query(F.data == "set_budget")
+@callbacks.exact(CallbackData.SET_BUDGET)
 async def set_budget_start(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await state.set_state(BudgetState.waiting_for_category)
@@ -33,12 +36,12 @@ async def set_budget_start(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(
-    F.data.startswith("cat_expense_"),
+@callbacks.prefix(
+    CallbackData.CAT_EXPENSE,
     BudgetState.waiting_for_category,
+    parse=str_arg("category"),
 )
-async def budget_select_category(callback: CallbackQuery, state: FSMContext) -> None:
-    category = callback.data.replace("cat_expense_", "")
+async def budget_select_category(callback: CallbackQuery, state: FSMContext, category: str) -> None:
     await state.update_data(budget_category=category)
     await state.set_state(BudgetState.waiting_for_period)
     await callback.message.edit_text(
@@ -49,12 +52,12 @@ async def budget_select_category(callback: CallbackQuery, state: FSMContext) ->
     await callback.answer()
 
 
-@router.callback_query(
-    F.data.startswith("budget_period_"),
+@callbacks.prefix(
+    CallbackData.BUDGET_PERIOD_PREFIX,
     BudgetState.waiting_for_period,
+    parse=str_arg("period"),
 )
-async def budget_select_period(callback: CallbackQuery, state: FSMContext) -> None:
-    period = callback.data.replace("budget_period_", "")
+async def budget_select_period(callback: CallbackQuery, state: FSMContext, period: str) -> None:
     await state.update_data(budget_period=period)
     period_name = "місячний" if period == "month" else "річний"
     await state.set_state(BudgetState.waiting_for_amount)
@@ -103,7 +106,7 @@ async def budget_process_amount(message: Message, state: FSMContext) -> None:
         await state.clear()
 
 
-@router.callback_query(F.data == "budgets")
+@callbacks.exact(CallbackData.BUDGETS)
 async def show_budgets_menu(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await callback.message.edit_text(
@@ -114,68 +117,54 @@ async def show_budgets_menu(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "view_budgets")
-async def view_budgets(callback: CallbackQuery) -> None:
-    budgets = await get_budgets(callback.from_user.id)
-    if not budgets:
-        await callback.message.edit_text(
-            "У вас ще немає встановлених бюджетів.\n\n"
-            "Встановіть бюджет, щоб контролювати витрати!",
-            reply_markup=budget_menu_kb(),
-        )
-        await callback.answer()
-        return
+def _budgets_text(statuses: list) -> str:
+    """Текст списку бюджетів з результату get_budget_statuses"""
     text = "Ваші бюджети:\n\n"
-    from datetime import datetime
-
-    today = datetime.now()
-    for budget in budgets:
-        budget_id, _, category, amount, period = budget[0], budget[1], budget[2], budget[3], budget[4]
+    for _, _, category, amount, period, spent in statuses:
         period_name = "Місяць" if period == "month" else "Рік"
-        if period == "month":
-            start_date = today.replace(day=1).strftime("%Y-%m-%d")
-        else:
-            start_date = today.replace(month=1, day=1).strftime("%Y-%m-%d")
-        end_date = today.strftime("%Y-%m-%d")
-        _, spent = await check_budget(
-            callback.from_user.id, category, period, start_date, end_date
-        )
-        spent = spent or 0
         percentage = (spent / amount) * 100 if amount > 0 else 0
         status_emoji = "🟢" if percentage < 80 else "🟡" if percentage < 100 else "🔴"
         text += f"{status_emoji} {category}\n"
         text += f"   Бюджет: {amount:,.2f} грн ({period_name})\n"
         text += f"   Витрачено: {spent:,.2f} грн ({percentage:.1f}%)\n"
         text += f"   Залишок: {max(0, amount - spent):,.2f} грн\n\n"
+    return text
+
+
+@callbacks.exact(CallbackData.VIEW_BUDGETS)
+async def view_budgets(callback: CallbackQuery) -> None:
+    statuses = await get_budget_statuses(callback.from_user.id, datetime.now())
+    if not statuses:
+        await callback.message.edit_text(
+            "У вас ще немає встановлених бюджетів.\n\n"
+            "Встановіть бюджет, щоб контролювати витрати!",
+            reply_markup=budget_menu_kb(),
+        )
+        await callback.answer()
+        return
     await callback.message.edit_text(
-        text, parse_mode="HTML", reply_markup=budget_list_kb(budgets)
+        _budgets_text(statuses), parse_mode="HTML", reply_markup=budget_list_kb(statuses)
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("delete_budget_"))
-async def delete_budget_confirm(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.prefix(CallbackData.DELETE_BUDGET_PREFIX, parse=int_arg("budget_id"))
+async def delete_budget_confirm(callback: CallbackQuery, state: FSMContext, budget_id: int) -> None:
     """Показати підтвердження видалення бюджету"""
     await state.clear()
-    try:
-        budget_id = int(callback.data.replace("delete_budget_", ""))
-        await callback.message.edit_text(
-            Messages.CONFIRM_DELETE_BUDGET,
-            parse_mode="HTML",
-            reply_markup=confirm_delete_budget_kb(budget_id),
-        )
-        await callback.answer()
-    except ValueError as e:
-        logger.error("Помилка парсингу budget_id: %s", e)
-        await callback.answer(Messages.ERRORS["delete_budget"], show_alert=True)
+    await callback.message.edit_text(
+        Messages.CONFIRM_DELETE_BUDGET,
+        parse_mode="HTML",
+        reply_markup=confirm_delete_budget_kb(budget_id),
+    )
+    await callback.answer()
 
 
-@router.callback_query(F.data.startswith("confirm_del_budget_"))
-async def delete_budget_confirm_yes(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.prefix(CallbackData.CONFIRM_DELETE_BUDGET_PREFIX, parse=int_arg("budget_id"))
+async def delete_budget_confirm_yes(callback: CallbackQuery, state: FSMContext, budget_id: int) -> None:
     """Підтверджене видалення бюджету"""
     await state.clear()
     try:
-        budget_id = int(callback.data.replace("confirm_del_budget_", ""))
         success = await delete_budget(budget_id, callback.from_user.id)
         if success:
             await callback.answer("Бюджет видалено!")
@@ -191,52 +180,30 @@ async def delete_budget_confirm_yes(callback: CallbackQuery, state: FSMContext)
                 )
         else:
             await callback.answer(Messages.ERRORS["delete_budget"], show_alert=True)
-    except (ValueError, Exception) as e:
+    except Exception as e:
         logger.error("Помилка видалення бюджету (callback): %s", e)
         await callback.answer(Messages.ERRORS["delete_budget"], show_alert=True)
 
 
-@router.callback_query(F.data == "cancel_del_budget")
+@callbacks.exact(CallbackData.CANCEL_DELETE_BUDGET)
 async def delete_budget_cancel(callback: CallbackQuery, state: FSMContext) -> None:
     """Скасування видалення - повернутися до списку бюджетів"""
     await state.clear()
-    budgets = await get_budgets(callback.from_user.id)
-    if not budgets:
+    statuses = await get_budget_statuses(callback.from_user.id, datetime.now())
+    if not statuses:
         await callback.message.edit_text(
             "У вас ще немає встановлених бюджетів.\n\n"
             "Встановіть бюджет, щоб контролювати витрати!",
             reply_markup=budget_menu_kb(),
         )
     else:
-        from datetime import datetime
-
-        today = datetime.now()
-        text = "Ваші бюджети:\n\n"
-        for budget in budgets:
-            budget_id, _, category, amount, period = budget[0], budget[1], budget[2], budget[3], budget[4]
-            period_name = "Місяць" if period == "month" else "Рік"
-            if period == "month":
-                start_date = today.replace(day=1).strftime("%Y-%m-%d")
-            else:
-                start_date = today.replace(month=1, day=1).strftime("%Y-%m-%d")
-            end_date = today.strftime("%Y-%m-%d")
-            _, spent = await check_budget(
-                callback.from_user.id, category, period, start_date, end_date
-            )
-            spent = spent or 0
-            percentage = (spent / amount) * 100 if amount > 0 else 0
-            status_emoji = "🟢" if percentage < 80 else "🟡" if percentage < 100 else "🔴"
-            text += f"{status_emoji} {category}\n"
-            text += f"   Бюджет: {amount:,.2f} грн ({period_name})\n"
-            text += f"   Витрачено: {spent:,.2f} грн ({percentage:.1f}%)\n"
-            text += f"   Залишок: {max(0, amount - spent):,.2f} грн\n\n"
         await callback.message.edit_text(
-            text, parse_mode="HTML", reply_markup=budget_list_kb(budgets)
+            _budgets_text(statuses), parse_mode="HTML", reply_markup=budget_list_kb(statuses)
         )
     await callback.answer("Скасовано")
 
 
-@router.callback_query(F.data.startswith("edit_budget_"))
+@callbacks.prefix(CallbackData.EDIT_BUDGET_PREFIX)
 async def edit_budget_callback(callback: CallbackQuery) -> None:
     await callback.answer(
         "Щоб змінити бюджет - видаліть поточний та створіть новий.",
@@ -1,19 +1,19 @@
 """Обробники експорту"""
 import logging
-from datetime import datetime
 
-from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
-from aiogram.types import BufferedInputFile, CallbackQuery
+from aiogram.types import CallbackQuery
 
+from callback_dispatch import callbacks
+from constants import CallbackData
+from export_jobs import EXPORT_FORMATS, ExportQueueFullError, export_artifact_key, get_export_queue
 from keyboards import export_menu_kb
-from reports import export_to_csv, export_to_excel
+from services import resend_cached
 
 logger = logging.getLogger(__name__)
-router = Router(name="export")
 
 
-@router.callback_query(F.data == "export")
+@callbacks.exact(CallbackData.EXPORT)
 async def show_export(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await callback.message.edit_text(
@@ -24,59 +24,41 @@ async def show_export(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "export_excel")
-async def export_excel_handler(callback: CallbackQuery) -> None:
-    await callback.answer("Генерую файл...")
+async def start_export(callback: CallbackQuery, kind: str) -> None:
+    """
+    Незмінені дані - надіслати готовий файл за file_id; інакше поставити
+    експорт у фонову чергу (прогрес і файл надішле воркер export_jobs).
+    """
+    user_id = callback.from_user.id
+    label = EXPORT_FORMATS[kind][2]
     try:
-        excel_file = await export_to_excel(callback.from_user.id)
-        if excel_file:
-            excel_file.seek(0)
-            doc = BufferedInputFile(
-                excel_file.read(),
-                filename=f"finance_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            )
-            await callback.message.answer_document(
-                document=doc,
-                caption="Ваші фінансові дані в форматі Excel",
-                reply_markup=export_menu_kb(),
-            )
-        else:
-            await callback.message.answer(
-                "Немає даних для експорту.\nДодайте транзакції, щоб експортувати дані.",
-                reply_markup=export_menu_kb(),
-            )
+        if await resend_cached(
+            callback.message.answer_document,
+            await export_artifact_key(user_id, kind),
+            caption=f"Ваші фінансові дані в форматі {label}",
+            reply_markup=export_menu_kb(),
+        ):
+            await callback.answer()
+            return
+
+        _, created = await get_export_queue().submit(user_id, callback.message.chat.id, kind)
+        await callback.answer("Генерую файл..." if created else "Цей експорт уже готується ⏳")
+    except ExportQueueFullError:
+        await callback.answer("Забагато експортів у черзі. Спробуйте за хвилину.", show_alert=True)
     except Exception as e:
-        logger.error("Помилка експорту в Excel: %s", e)
+        logger.error("Помилка експорту в %s: %s", label, e)
+        await callback.answer()
         await callback.message.answer(
             "Помилка експорту даних. Спробуйте пізніше.",
             reply_markup=export_menu_kb(),
         )
 
 
-@router.callback_query(F.data == "export_csv")
+@callbacks.exact(CallbackData.EXPORT_EXCEL)
+async def export_excel_handler(callback: CallbackQuery) -> None:
+    await start_export(callback, "excel")
+
+
+@callbacks.exact(CallbackData.EXPORT_CSV)
 async def export_csv_handler(callback: CallbackQuery) -> None:
-    await callback.answer("Генерую файл...")
-    try:
-        csv_file = await export_to_csv(callback.from_user.id)
-        if csv_file:
-            csv_file.seek(0)
-            doc = BufferedInputFile(
-                csv_file.read(),
-                filename=f"finance_{datetime.now().strftime('%Y%m%d')}.csv",
-            )
-            await callback.message.answer_document(
-                document=doc,
-                caption="Ваші фінансові дані в форматі CSV",
-                reply_markup=export_menu_kb(),
-            )
-        else:
-            await callback.message.answer(
-                "Немає даних для експорту.\nДодайте транзакції, щоб експортувати дані.",
-                reply_markup=export_menu_kb(),
-            )
-    except Exception as e:
-        logger.error("Помилка експорту в CSV: %s", e)
-        await callback.message.answer(
-            "Помилка експорту даних. Спробуйте пізніше.",
-            reply_markup=export_menu_kb(),
-        )
+    await start_export(callback, "csv")
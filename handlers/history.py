@@ -1,40 +1,54 @@
 """Обробники історії транзакцій"""
 import logging
+import re
 
-from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
+from callback_dispatch import callbacks, int_arg
+from constants import CallbackData
 from database import delete_transaction
 from keyboards import back_button_kb, confirm_delete_trans_kb
 from services import show_history_page
 from texts import Messages
+from utils import parse_history_cursor
 
 logger = logging.getLogger(__name__)
-router = Router(name="history")
 
+_DELETE_TRANS_ARGS = re.compile(r"(\d+)_(\d+(?:_\w+)?)")
 
-@router.callback_query(F.data == "view_history")
+
+def _history_cursor_args(rest: str) -> dict:
+    page, cursor = parse_history_cursor(rest)
+    return {"page": page, "cursor": cursor}
+
+
+def _delete_trans_args(rest: str) -> dict:
+    match = _DELETE_TRANS_ARGS.fullmatch(rest)
+    if match is None:
+        raise ValueError(rest)
+    return {"trans_id": int(match.group(1)), "page": match.group(2)}
+
+
+@callbacks.exact(CallbackData.VIEW_HISTORY)
 async def view_history(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await show_history_page(callback.from_user.id, callback, 1)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("history_page_"))
-async def history_page_handler(callback: CallbackQuery) -> None:
-    page = int(callback.data.replace("history_page_", ""))
-    await show_history_page(callback.from_user.id, callback, page)
+@callbacks.prefix(CallbackData.HISTORY_PAGE_PREFIX, parse=_history_cursor_args)
+async def history_page_handler(callback: CallbackQuery, page: int, cursor) -> None:
+    await show_history_page(callback.from_user.id, callback, page, cursor=cursor)
     await callback.answer()
 
 
-@router.callback_query(F.data.regexp(r"^delete_trans_(\d+)_(\d+)$"))
-async def delete_transaction_confirm(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.prefix(CallbackData.DELETE_TRANS_PREFIX, parse=_delete_trans_args)
+async def delete_transaction_confirm(
+    callback: CallbackQuery, state: FSMContext, trans_id: int, page: str
+) -> None:
     """Показати підтвердження видалення транзакції"""
     await state.clear()
-    parts = callback.data.split("_")
-    trans_id = int(parts[2])
-    page = int(parts[3])
     await callback.message.edit_text(
         Messages.CONFIRM_DELETE_TRANS.format(trans_id=trans_id),
         parse_mode="HTML",
@@ -43,32 +57,34 @@ async def delete_transaction_confirm(callback: CallbackQuery, state: FSMContext)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("confirm_del_trans_"))
-async def delete_transaction_confirm_yes(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.prefix(CallbackData.CONFIRM_DELETE_TRANS_PREFIX, parse=int_arg("trans_id"))
+async def delete_transaction_confirm_yes(
+    callback: CallbackQuery, state: FSMContext, trans_id: int
+) -> None:
     """Підтверджене видалення транзакції"""
     await state.clear()
     try:
-        trans_id = int(callback.data.replace("confirm_del_trans_", ""))
         success = await delete_transaction(trans_id, callback.from_user.id)
         if success:
             await callback.answer("Видалено!")
             await show_history_page(callback.from_user.id, callback, 1)
         else:
             await callback.answer(Messages.ERRORS["delete_transaction"], show_alert=True)
-    except (ValueError, Exception) as e:
+    except Exception as e:
         logger.error("Помилка видалення транзакції (callback): %s", e)
         await callback.answer(Messages.ERRORS["delete_transaction"], show_alert=True)
 
 
-@router.callback_query(F.data.startswith("cancel_del_trans_"))
-async def delete_transaction_cancel(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.prefix(CallbackData.CANCEL_DELETE_TRANS_PREFIX, parse=_history_cursor_args)
+async def delete_transaction_cancel(
+    callback: CallbackQuery, state: FSMContext, page: int, cursor
+) -> None:
     """Скасування видалення - повернутися до історії"""
     await state.clear()
-    page = int(callback.data.replace("cancel_del_trans_", ""))
-    await show_history_page(callback.from_user.id, callback, page)
+    await show_history_page(callback.from_user.id, callback, page, cursor=cursor)
     await callback.answer("Скасовано")
 
 
-@router.callback_query(F.data == "history_info")
+@callbacks.exact(CallbackData.HISTORY_INFO)
 async def history_info_callback(callback: CallbackQuery) -> None:
     await callback.answer()
@@ -1,19 +1,19 @@
 """Обробники навігації"""
 import logging
 
-from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery
 
+from callback_dispatch import callbacks
+from constants import CallbackData
 from keyboards import main_menu_kb
 from services import safe_edit_or_answer
 from texts import Messages
 
 logger = logging.getLogger(__name__)
-router = Router(name="navigation")
 
 
-@router.callback_query(F.data == "back_main")
+@callbacks.exact(CallbackData.BACK_MAIN)
 async def back_to_main(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await safe_edit_or_answer(
@@ -22,7 +22,7 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "cancel")
+@callbacks.exact(CallbackData.CANCEL)
 async def cancel_action(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     await safe_edit_or_answer(
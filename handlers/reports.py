@@ -1,25 +1,34 @@
 """Обробники звітів та графіків"""
 import logging
 
-from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import BufferedInputFile, CallbackQuery
 
+from callback_dispatch import callbacks, str_arg
+from constants import DYNAMICS_WINDOWS, CallbackData
 from database import get_balance
 from keyboards import charts_menu_kb, reports_menu_kb
-from services import safe_edit_or_answer
+from renderer import RendererBusyError
 from reports import (
+    artifact_key,
     generate_dynamics_chart,
     generate_pie_chart,
     generate_report,
     get_period_dates,
 )
+from services import answer_cached_media, safe_edit_or_answer
 
 logger = logging.getLogger(__name__)
-router = Router(name="reports")
 
+CHART_BUSY_TEXT = "Зараз будується багато графіків. Спробуйте за хвилину."
 
-@router.callback_query(F.data == "balance")
+
+def _dynamics_window_args(rest: str) -> dict:
+    months, label = DYNAMICS_WINDOWS[rest]
+    return {"months": months, "label": label}
+
+
+@callbacks.exact(CallbackData.BALANCE)
 async def show_balance(callback: CallbackQuery, state: FSMContext) -> None:
     from keyboards import balance_actions_kb
 
@@ -40,7 +49,7 @@ async def show_balance(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "reports")
+@callbacks.exact(CallbackData.REPORTS)
 async def show_reports(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     text = "Аналітика\n\nОберіть період для аналізу:"
@@ -49,9 +58,8 @@ async def show_reports(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("report_"))
-async def generate_report_handler(callback: CallbackQuery) -> None:
-    period = callback.data.replace("report_", "")
+@callbacks.prefix(CallbackData.REPORT_PREFIX, parse=str_arg("period"))
+async def generate_report_handler(callback: CallbackQuery, period: str) -> None:
     start_date, end_date, period_name = get_period_dates(period)
     await callback.answer("Генерую звіт...")
     try:
@@ -69,7 +77,7 @@ async def generate_report_handler(callback: CallbackQuery) -> None:
         )
 
 
-@router.callback_query(F.data == "charts")
+@callbacks.exact(CallbackData.CHARTS)
 async def show_charts(callback: CallbackQuery, state: FSMContext) -> None:
     await state.clear()
     text = "Графічна аналітика\n\nОберіть тип графіка:"
@@ -78,27 +86,33 @@ async def show_charts(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "chart_expense_month")
+@callbacks.exact(CallbackData.CHART_EXPENSE_MONTH)
 async def chart_expense(callback: CallbackQuery) -> None:
     await callback.answer("Генерую графік...")
     try:
-        chart = await generate_pie_chart(
-            callback.from_user.id, "expense", "останній місяць"
+        user_id = callback.from_user.id
+
+        async def build() -> BufferedInputFile | None:
+            chart = await generate_pie_chart(user_id, "expense", "останній місяць")
+            return BufferedInputFile(chart, filename="chart.png") if chart else None
+
+        sent = await answer_cached_media(
+            callback.message,
+            await artifact_key(user_id, callback.data),
+            build,
+            as_photo=True,
+            caption="Витрати за останній місяць",
+            reply_markup=charts_menu_kb(),
         )
-        if chart:
-            chart.seek(0)
-            photo = BufferedInputFile(chart.read(), filename="chart.png")
-            await callback.message.answer_photo(
-                photo=photo,
-                caption="Витрати за останній місяць",
-                reply_markup=charts_menu_kb(),
-            )
-        else:
+        if not sent:
             await callback.message.answer(
                 "Недостатньо даних для побудови графіка.\n"
                 "Додайте транзакції, щоб побачити аналітику.",
                 reply_markup=charts_menu_kb(),
             )
+    except (RendererBusyError, TimeoutError):
+        logger.warning("Рендерер зайнятий, графік витрат не побудовано")
+        await callback.message.answer(CHART_BUSY_TEXT, reply_markup=charts_menu_kb())
     except Exception as e:
         logger.error("Помилка генерації графіка витрат: %s", e)
         await callback.message.answer(
@@ -107,27 +121,33 @@ async def chart_expense(callback: CallbackQuery) -> None:
         )
 
 
-@router.callback_query(F.data == "chart_income_month")
+@callbacks.exact(CallbackData.CHART_INCOME_MONTH)
 async def chart_income(callback: CallbackQuery) -> None:
     await callback.answer("Генерую графік...")
     try:
-        chart = await generate_pie_chart(
-            callback.from_user.id, "income", "останній місяць"
+        user_id = callback.from_user.id
+
+        async def build() -> BufferedInputFile | None:
+            chart = await generate_pie_chart(user_id, "income", "останній місяць")
+            return BufferedInputFile(chart, filename="chart.png") if chart else None
+
+        sent = await answer_cached_media(
+            callback.message,
+            await artifact_key(user_id, callback.data),
+            build,
+            as_photo=True,
+            caption="Доходи за останній місяць",
+            reply_markup=charts_menu_kb(),
         )
-        if chart:
-            chart.seek(0)
-            photo = BufferedInputFile(chart.read(), filename="chart.png")
-            await callback.message.answer_photo(
-                photo=photo,
-                caption="Доходи за останній місяць",
-                reply_markup=charts_menu_kb(),
-            )
-        else:
+        if not sent:
             await callback.message.answer(
                 "Недостатньо даних для побудови графіка.\n"
                 "Додайте транзакції, щоб побачити аналітику.",
                 reply_markup=charts_menu_kb(),
             )
+    except (RendererBusyError, TimeoutError):
+        logger.warning("Рендерер зайнятий, графік доходів не побудовано")
+        await callback.message.answer(CHART_BUSY_TEXT, reply_markup=charts_menu_kb())
     except Exception as e:
         logger.error("Помилка генерації графіка доходів: %s", e)
         await callback.message.answer(
@@ -136,25 +156,33 @@ async def chart_income(callback: CallbackQuery) -> None:
         )
 
 
-@router.callback_query(F.data == "chart_dynamics_year")
-async def chart_dynamics(callback: CallbackQuery) -> None:
+@callbacks.prefix(CallbackData.CHART_DYNAMICS_PREFIX, parse=_dynamics_window_args)
+async def chart_dynamics(callback: CallbackQuery, months: int | None, label: str) -> None:
     await callback.answer("Генерую графік...")
     try:
-        chart = await generate_dynamics_chart(callback.from_user.id)
-        if chart:
-            chart.seek(0)
-            photo = BufferedInputFile(chart.read(), filename="dynamics.png")
-            await callback.message.answer_photo(
-                photo=photo,
-                caption="Динаміка доходів та витрат за рік",
-                reply_markup=charts_menu_kb(),
-            )
-        else:
+        user_id = callback.from_user.id
+
+        async def build() -> BufferedInputFile | None:
+            chart = await generate_dynamics_chart(user_id, months)
+            return BufferedInputFile(chart, filename="dynamics.png") if chart else None
+
+        sent = await answer_cached_media(
+            callback.message,
+            await artifact_key(user_id, callback.data),
+            build,
+            as_photo=True,
+            caption=f"Динаміка доходів та витрат за {label}",
+            reply_markup=charts_menu_kb(),
+        )
+        if not sent:
             await callback.message.answer(
                 "Недостатньо даних для побудови графіка.\n"
                 "Додайте транзакції, щоб побачити динаміку.",
                 reply_markup=charts_menu_kb(),
             )
+    except (RendererBusyError, TimeoutError):
+        logger.warning("Рендерер зайнятий, графік динаміки не побудовано")
+        await callback.message.answer(CHART_BUSY_TEXT, reply_markup=charts_menu_kb())
     except Exception as e:
         logger.error("Помилка генерації графіка динаміки: %s", e)
         await callback.message.answer(
@@ -5,7 +5,9 @@ from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
-from database import add_transaction, get_balance, delete_transaction
+from callback_dispatch import callbacks, str_arg
+from constants import CallbackData
+from database import delete_transaction, record_transaction
 from keyboards import (
     cancel_button_kb,
     category_kb,
@@ -24,7 +26,7 @@ logger = logging.getLogger(__name__)
 router = Router(name="transactions")
 
 
-@router.callback_query(F.data == "add_expense")
+@callbacks.exact(CallbackData.ADD_EXPENSE)
 async def add_expense(callback: CallbackQuery, state: FSMContext) -> None:
     await state.set_data({})
     await state.update_data(transaction_type="expense")
@@ -36,7 +38,7 @@ async def add_expense(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "quick_expense")
+@callbacks.exact(CallbackData.QUICK_EXPENSE)
 async def quick_expense(callback: CallbackQuery, state: FSMContext) -> None:
     await state.set_data({})
     await state.update_data(transaction_type="expense")
@@ -52,15 +54,18 @@ async def quick_expense(callback: CallbackQuery, state: FSMContext) -> None:
 QUICK_CAT_MAP = {"☕ Кава": "🍔 Їжа"}
 
 
-@router.callback_query(F.data.startswith("quick_cat_"))
-async def quick_category(callback: CallbackQuery, state: FSMContext) -> None:
+def _category_args(rest: str) -> dict:
+    """тип_категорія з callback_data (cat_ та quick_cat_)"""
+    trans_type, category = rest.split("_", 1)
+    return {"trans_type": trans_type, "category": category}
+
+
+@callbacks.prefix(CallbackData.QUICK_CAT_PREFIX, parse=_category_args)
+async def quick_category(
+    callback: CallbackQuery, state: FSMContext, trans_type: str, category: str
+) -> None:
     from datetime import datetime
 
-    parts = callback.data.split("_", 3)
-    if len(parts) < 4:
-        await callback.answer("Помилка вибору категорії")
-        return
-    trans_type, category = parts[2], parts[3]
     category = QUICK_CAT_MAP.get(category, category)
     today_str = datetime.now().strftime("%Y-%m-%d")
     await state.update_data(
@@ -75,7 +80,7 @@ async def quick_category(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "add_income")
+@callbacks.exact(CallbackData.ADD_INCOME)
 async def add_income(callback: CallbackQuery, state: FSMContext) -> None:
     await state.set_data({})
     await state.update_data(transaction_type="income")
@@ -87,13 +92,10 @@ async def add_income(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("cat_"))
-async def select_category(callback: CallbackQuery, state: FSMContext) -> None:
-    parts = callback.data.split("_", 2)
-    if len(parts) < 3:
-        await callback.answer("Помилка вибору категорії")
-        return
-    trans_type, category = parts[1], parts[2]
+@callbacks.prefix(CallbackData.CAT_PREFIX, parse=_category_args)
+async def select_category(
+    callback: CallbackQuery, state: FSMContext, trans_type: str, category: str
+) -> None:
     data = await state.get_data()
     existing_type = data.get("transaction_type", trans_type)
     await state.update_data(category=category, transaction_type=existing_type)
@@ -108,12 +110,11 @@ async def select_category(callback: CallbackQuery, state: FSMContext) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("trans_date_"), TransactionState.waiting_for_date)
-async def select_date(callback: CallbackQuery, state: FSMContext) -> None:
+@callbacks.prefix(CallbackData.TRANS_DATE_PREFIX, TransactionState.waiting_for_date, parse=str_arg("choice"))
+async def select_date(callback: CallbackQuery, state: FSMContext, choice: str) -> None:
     """Обробка вибору дати транзакції"""
     from datetime import datetime, timedelta
 
-    choice = callback.data.replace("trans_date_", "")
     today = datetime.now()
     if choice == "today" or choice == "skip":
         date_str = today.strftime("%Y-%m-%d")
@@ -166,10 +167,11 @@ async def process_description(message: Message, state: FSMContext) -> None:
         await state.clear()
         return
     try:
-        await add_transaction(
+        # Запис, новий баланс і стан бюджетів категорії - одна операція БД
+        recorded = await record_transaction(
             message.from_user.id, trans_type, amount, category, description, date_str
         )
-        income, expense, balance = await get_balance(message.from_user.id)
+        balance = recorded.balance
         emoji = "📉" if trans_type == "expense" else "📈"
         trans_name = "Витрата" if trans_type == "expense" else "Дохід"
         safe_desc = escape_html(description) if description else "Не вказано"
@@ -188,7 +190,7 @@ async def process_description(message: Message, state: FSMContext) -> None:
             reply_markup=transaction_success_kb(),
         )
         if trans_type == "expense":
-            await check_and_notify_budget(message, category)
+            await check_and_notify_budget(message, category, recorded)
     except Exception as e:
         logger.error("Помилка додавання транзакції: %s", e)
         await processing_msg.delete()
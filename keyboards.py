@@ -1,19 +1,80 @@
+from functools import cache, lru_cache
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
 from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     ReplyKeyboardMarkup,
     KeyboardButton,
 )
+from aiohttp import FormData
+from pydantic import PrivateAttr
 
-from config import EXPENSE_CATEGORIES, INCOME_CATEGORIES
+from config import EXPENSE_CATEGORIES, INCOME_CATEGORIES, settings
 from constants import CallbackData
+from utils import HISTORY_ANCHOR, HISTORY_NEWER, HISTORY_OLDER, encode_history_cursor
+
+
+# ==================== ЗАКЕШОВАНІ КЛАВІАТУРИ ====================
+# Моделі aiogram незмінні (frozen), тож кожна клавіатура будується один раз
+# (functools.cache / lru_cache за аргументами) і спільно використовується.
+# JSON такої клавіатури теж рахується один раз - див. PreparedMarkupSession.
+
+class PreparedInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """Inline клавіатура з кешованим JSON для Bot API"""
+
+    _prepared_json: str | None = PrivateAttr(default=None)
+
+
+class PreparedReplyKeyboardMarkup(ReplyKeyboardMarkup):
+    """Reply клавіатура з кешованим JSON для Bot API"""
+
+    _prepared_json: str | None = PrivateAttr(default=None)
+
+
+_PREPARED_MARKUPS = (PreparedInlineKeyboardMarkup, PreparedReplyKeyboardMarkup)
+
+
+class PreparedMarkupSession(AiohttpSession):
+    """
+    HTTP-сесія бота, що серіалізує закешовані клавіатури в JSON лише раз.
+    Поля методу передаються в prepare_value як є (а не через model_dump методу),
+    інакше клавіатура перетворилася б на dict до того, як її можна розпізнати.
+    """
+
+    def build_form_data(self, bot: Bot, method: TelegramMethod[Any]) -> FormData:
+        form = FormData(quote_fields=False)
+        files: dict[str, Any] = {}
+        for key, value in method:
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        for key, value in files.items():
+            form.add_field(
+                key,
+                value.read(bot),
+                filename=value.filename or key,
+            )
+        return form
+
+    def prepare_value(self, value: Any, bot: Bot, files: dict[str, Any], _dumps_json: bool = True) -> Any:
+        if _dumps_json and isinstance(value, _PREPARED_MARKUPS):
+            if value._prepared_json is None:
+                value._prepared_json = super().prepare_value(value, bot=bot, files=files)
+            return value._prepared_json
+        return super().prepare_value(value, bot=bot, files=files, _dumps_json=_dumps_json)
 
 
 # ==================== REPLY КЛАВІАТУРА (біля поля вводу) ====================
 
+@cache
 def main_reply_kb():
     """Головна Reply клавіатура - завжди доступна біля поля вводу"""
-    return ReplyKeyboardMarkup(
+    return PreparedReplyKeyboardMarkup(
         keyboard=[
             [
                 KeyboardButton(text="💸 Витрата"),
@@ -37,9 +98,10 @@ def main_reply_kb():
     )
 
 
+@cache
 def quick_reply_kb():
     """Швидка клавіатура для частих операцій"""
-    return ReplyKeyboardMarkup(
+    return PreparedReplyKeyboardMarkup(
         keyboard=[
             [
                 KeyboardButton(text="🍔 Їжа"),
@@ -61,9 +123,10 @@ def quick_reply_kb():
 
 # ==================== INLINE КЛАВІАТУРИ (під повідомленнями) ====================
 
+@cache
 def main_menu_kb():
     """Inline меню для детальних дій"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="💸 Додати витрату", callback_data=CallbackData.ADD_EXPENSE),
@@ -84,9 +147,10 @@ def main_menu_kb():
     )
 
 
+@cache
 def quick_expense_kb():
     """Швидкі витрати - топові категорії"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="🍔 Їжа", callback_data="quick_cat_expense_🍔 Їжа"),
@@ -108,6 +172,7 @@ def quick_expense_kb():
     )
 
 
+@cache
 def category_kb(trans_type: str):
     """Вибір категорії - компактний grid"""
     categories = EXPENSE_CATEGORIES if trans_type == "expense" else INCOME_CATEGORIES
@@ -125,12 +190,13 @@ def category_kb(trans_type: str):
     rows.append([
         InlineKeyboardButton(text="✖️ Відмінити", callback_data=CallbackData.CANCEL),
     ])
-    return InlineKeyboardMarkup(inline_keyboard=rows)
+    return PreparedInlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@cache
 def reports_menu_kb():
     """Меню звітів - компактне"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="Сьогодні", callback_data="report_today")],
             [
@@ -150,13 +216,20 @@ def reports_menu_kb():
     )
 
 
+@cache
 def charts_menu_kb():
     """Меню графіків"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="🥧 Витрати по категоріях", callback_data="chart_expense_month")],
             [InlineKeyboardButton(text="🥧 Доходи по категоріях", callback_data="chart_income_month")],
             [InlineKeyboardButton(text="📊 Динаміка за рік", callback_data="chart_dynamics_year")],
+            [
+                InlineKeyboardButton(text="3 міс", callback_data="chart_dynamics_3"),
+                InlineKeyboardButton(text="6 міс", callback_data="chart_dynamics_6"),
+                InlineKeyboardButton(text="24 міс", callback_data="chart_dynamics_24"),
+                InlineKeyboardButton(text="Весь час", callback_data="chart_dynamics_all"),
+            ],
             [
                 InlineKeyboardButton(text="◀️ До звітів", callback_data=CallbackData.REPORTS),
                 InlineKeyboardButton(text="🏠 Головна", callback_data=CallbackData.BACK_MAIN),
@@ -165,9 +238,10 @@ def charts_menu_kb():
     )
 
 
+@cache
 def export_menu_kb():
     """Меню експорту"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="📊 Excel", callback_data="export_excel"),
@@ -178,9 +252,10 @@ def export_menu_kb():
     )
 
 
+@cache
 def budget_menu_kb():
     """Меню бюджетів"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="➕ Новий бюджет", callback_data=CallbackData.SET_BUDGET)],
             [InlineKeyboardButton(text="📋 Мої бюджети", callback_data=CallbackData.VIEW_BUDGETS)],
@@ -189,9 +264,10 @@ def budget_menu_kb():
     )
 
 
+@cache
 def budget_period_kb():
     """Вибір періоду бюджету"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="📅 Місяць", callback_data="budget_period_month"),
@@ -202,18 +278,20 @@ def budget_period_kb():
     )
 
 
+@cache
 def back_button_kb():
     """Кнопка повернення на головну"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="🏠 Головна", callback_data=CallbackData.BACK_MAIN)],
         ]
     )
 
 
+@cache
 def date_select_kb():
     """Вибір дати транзакції"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="Сьогодні", callback_data="trans_date_today"),
@@ -225,18 +303,20 @@ def date_select_kb():
     )
 
 
+@cache
 def cancel_button_kb():
     """Кнопка скасування"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="✖️ Відмінити", callback_data=CallbackData.CANCEL)],
         ]
     )
 
 
+@cache
 def balance_actions_kb():
     """Швидкі дії з балансу"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="💸 Витрата", callback_data=CallbackData.ADD_EXPENSE),
@@ -254,9 +334,10 @@ def balance_actions_kb():
     )
 
 
+@cache
 def transaction_success_kb():
     """Дії після додавання транзакції"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(text="➕ Ще витрата", callback_data=CallbackData.ADD_EXPENSE),
@@ -273,9 +354,13 @@ def transaction_success_kb():
 
 def budget_list_kb(budgets: list) -> InlineKeyboardMarkup:
     """Клавіатура з кнопками для списку бюджетів (delete -> confirmation)"""
+    return _budget_list_kb(tuple(budget[0] for budget in budgets))
+
+
+@lru_cache(maxsize=settings.KEYBOARD_CACHE_SIZE)
+def _budget_list_kb(budget_ids: tuple[int, ...]) -> InlineKeyboardMarkup:
     rows: list[list[InlineKeyboardButton]] = []
-    for budget in budgets:
-        budget_id = budget[0]
+    for budget_id in budget_ids:
         rows.append([
             InlineKeyboardButton(text="✏️ Змінити", callback_data=f"edit_budget_{budget_id}"),
             InlineKeyboardButton(text="🗑 Видалити", callback_data=f"delete_budget_{budget_id}"),
@@ -287,12 +372,13 @@ def budget_list_kb(budgets: list) -> InlineKeyboardMarkup:
         InlineKeyboardButton(text="◀️ Назад", callback_data=CallbackData.BUDGETS),
         InlineKeyboardButton(text="🏠 Головна", callback_data=CallbackData.BACK_MAIN),
     ])
-    return InlineKeyboardMarkup(inline_keyboard=rows)
+    return PreparedInlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def confirm_delete_trans_kb(trans_id: int, page: int):
-    """Клавіатура підтвердження видалення транзакції"""
-    return InlineKeyboardMarkup(
+@lru_cache(maxsize=settings.KEYBOARD_CACHE_SIZE)
+def confirm_delete_trans_kb(trans_id: int, page: str):
+    """Клавіатура підтвердження видалення транзакції (page - курсор сторінки для повернення)"""
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
@@ -308,9 +394,10 @@ def confirm_delete_trans_kb(trans_id: int, page: int):
     )
 
 
+@lru_cache(maxsize=settings.KEYBOARD_CACHE_SIZE)
 def confirm_delete_budget_kb(budget_id: int):
     """Клавіатура підтвердження видалення бюджету"""
-    return InlineKeyboardMarkup(
+    return PreparedInlineKeyboardMarkup(
         inline_keyboard=[
             [
                 InlineKeyboardButton(
@@ -327,26 +414,36 @@ def confirm_delete_budget_kb(budget_id: int):
 
 
 def history_navigation_kb(page: int, total_pages: int, transactions: list = None):
-    """Навігація по історії транзакцій з кнопками видалення"""
+    """Навігація по історії транзакцій з кнопками видалення (курсори в callback_data)"""
+    # Рядки БД - кортежі, тож сторінка кешується за своїм вмістом
+    return _history_navigation_kb(page, total_pages, tuple(transactions or ()))
+
+
+@lru_cache(maxsize=settings.KEYBOARD_CACHE_SIZE)
+def _history_navigation_kb(page: int, total_pages: int, transactions: tuple):
     rows: list[list[InlineKeyboardButton]] = []
     if transactions:
+        # Повернення після скасування видалення - на цю ж сторінку від її першого рядка
+        anchor = encode_history_cursor(page, HISTORY_ANCHOR, transactions[0])
         for trans in transactions:
             trans_id = trans[0]
             rows.append([
                 InlineKeyboardButton(
                     text=f"🗑 Видалити ID:{trans_id}",
-                    callback_data=f"delete_trans_{trans_id}_{page}",
+                    callback_data=f"delete_trans_{trans_id}_{anchor}",
                 ),
             ])
     nav_buttons: list[InlineKeyboardButton] = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"history_page_{page - 1}"))
+    if page > 1 and transactions:
+        prev_cursor = encode_history_cursor(page - 1, HISTORY_NEWER, transactions[0])
+        nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"history_page_{prev_cursor}"))
     nav_buttons.append(
         InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data=CallbackData.HISTORY_INFO),
     )
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"history_page_{page + 1}"))
+    if page < total_pages and transactions:
+        next_cursor = encode_history_cursor(page + 1, HISTORY_OLDER, transactions[-1])
+        nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"history_page_{next_cursor}"))
     if nav_buttons:
         rows.append(nav_buttons)
     rows.append([InlineKeyboardButton(text="🏠 Головна", callback_data=CallbackData.BACK_MAIN)])
-    return InlineKeyboardMarkup(inline_keyboard=rows)
+    return PreparedInlineKeyboardMarkup(inline_keyboard=rows)
@@ -1,4 +1,5 @@
 """Головний файл запуску бота"""
+import argparse
 import asyncio
 import logging
 import os
@@ -8,12 +9,22 @@ from pathlib import Path
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
 from config import settings
-from database import init_db
+from database import (
+    check_db_health,
+    close_db,
+    init_db,
+    rebuild_rollups,
+    rebuild_user_balances,
+)
+from export_jobs import get_export_queue, shutdown_export_queue
+from fsm_storage import SQLiteStorage
 from handlers import register_handlers
+from keyboards import PreparedMarkupSession
+from middlewares import EditDeduplicationMiddleware, ThrottlingMiddleware
+from renderer import get_renderer, shutdown_renderer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -48,13 +59,27 @@ def remove_lock() -> None:
     LOCK_FILE.unlink(missing_ok=True)
 
 
-async def main() -> None:
-    """Головна функція"""
+def create_bot() -> Bot:
+    """Bot з підготовленими клавіатурами та пропуском незмінних редагувань"""
     bot = Bot(
         token=settings.BOT_TOKEN,
+        session=PreparedMarkupSession(),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
+    bot.session.middleware(EditDeduplicationMiddleware())
+    return bot
+
+
+def create_sqlite_storage() -> SQLiteStorage:
+    return SQLiteStorage(
+        ttl=settings.FSM_STATE_TTL,
+        hot_size=settings.FSM_HOT_CACHE_SIZE,
+        compact_interval=settings.FSM_COMPACT_INTERVAL,
+    )
 
+
+def create_dispatcher() -> Dispatcher:
+    """Dispatcher зі сховищем FSM, обмеженням частоти та всіма обробниками"""
     if settings.REDIS_URL:
         try:
             from aiogram.fsm.storage.redis import RedisStorage
@@ -63,18 +88,23 @@ async def main() -> None:
             logger.info("Використовується Redis FSM storage")
         except ImportError:
             logger.warning("Пакет redis не встановлено. pip install redis")
-            storage = MemoryStorage()
+            storage = create_sqlite_storage()
         except Exception as e:
-            logger.warning("Redis недоступний, використовується Memory: %s", e)
-            storage = MemoryStorage()
+            logger.warning("Redis недоступний, використовується SQLite: %s", e)
+            storage = create_sqlite_storage()
     else:
-        storage = MemoryStorage()
+        storage = create_sqlite_storage()
 
     dp = Dispatcher(storage=storage)
+    # Один бакет звичайних дій на користувача - спільний для повідомлень і кнопок
+    throttling = ThrottlingMiddleware()
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
     register_handlers(dp)
+    return dp
+
 
-    await init_db()
-    logger.info("База даних ініціалізована")
+async def set_commands(bot: Bot) -> None:
     commands = [
         BotCommand(command="start", description="Почати роботу"),
         BotCommand(command="menu", description="Головне меню"),
@@ -85,12 +115,70 @@ async def main() -> None:
     await bot.set_my_commands(commands)
     logger.info("Команди бота встановлено")
 
-    await bot.delete_webhook(drop_pending_updates=True)
-    logger.info("Бот запущено успішно")
-    await dp.start_polling(bot)
+
+async def main() -> None:
+    """Головна функція"""
+    if settings.WORKERS > 1:
+        from supervisor import run_supervisor
+
+        await run_supervisor(settings.WORKERS)
+        return
+
+    bot = create_bot()
+    dp = create_dispatcher()
+
+    try:
+        await init_db()
+        if not await check_db_health():
+            logger.warning("Перевірка з'єднань з БД не пройдена")
+        logger.info("База даних ініціалізована")
+        await get_renderer().start()
+        await get_export_queue().start(bot)
+        await set_commands(bot)
+
+        if settings.RUN_MODE == "webhook":
+            from webhook import run_webhook
+
+            logger.info("Бот запущено успішно (webhook)")
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Бот запущено успішно")
+            await dp.start_polling(bot)
+    finally:
+        await shutdown_export_queue()
+        shutdown_renderer()
+        await close_db()
+        logger.info("З'єднання з БД закрито")
+
+
+async def rebuild_projections() -> None:
+    """Перебудувати похідні таблиці (баланси, rollup) з таблиці transactions"""
+    try:
+        await init_db()
+        users = await rebuild_user_balances()
+        logger.info("user_balances перебудовано: %s користувачів", users)
+        rows = await rebuild_rollups()
+        logger.info("rollup-таблиці перебудовано: %s рядків", rows)
+    finally:
+        await close_db()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="FinBot - Telegram-бот для фінансів")
+    parser.add_argument(
+        "--rebuild-projections",
+        action="store_true",
+        help="перебудувати баланси та rollup-таблиці з transactions і завершити роботу",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.rebuild_projections:
+        asyncio.run(rebuild_projections())
+        sys.exit(0)
     if check_another_instance():
         print("Помилка: Бот вже запущений. Зупиніть інший екземпляр перед запуском.")
         sys.exit(1)
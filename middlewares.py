@@ -0,0 +1,203 @@
+"""Middleware бота: обмеження частоти вхідних оновлень і вихідні запити до Telegram"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.default import Default
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendMessage,
+    TelegramMethod,
+)
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from cache import LRUDict
+from config import settings
+from constants import CallbackData
+
+logger = logging.getLogger(__name__)
+
+# Callback-кнопки з важкою роботою (БД, рендеринг, завантаження файлів)
+HEAVY_CALLBACK_PREFIXES = ("chart_", "export_", CallbackData.REPORT_PREFIX.value)
+
+THROTTLE_MESSAGE = "Забагато запитів, зачекайте кілька секунд 🙏"
+THROTTLE_HEAVY_MESSAGE = "Графіки, звіти та експорт можна запитувати не так часто. Зачекайте трохи 🙏"
+
+
+class TokenBucket:
+    """Відро токенів: capacity - запас, rate - поповнення за секунду"""
+
+    __slots__ = ("tokens", "updated_at", "warned")
+
+    def __init__(self, capacity: float, now: float) -> None:
+        self.tokens = capacity
+        self.updated_at = now
+        # Чи вже відповіли "зачекайте" з моменту вичерпання (щоб не спамити відповідями)
+        self.warned = False
+
+    def consume(self, rate: float, capacity: float, now: float) -> bool:
+        self.tokens = min(capacity, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.warned = False
+            return True
+        return False
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Обмеження частоти повідомлень і callback-кнопок для кожного користувача.
+
+    Два незалежні бакети: звичайні дії та важкі (HEAVY_CALLBACK_PREFIXES).
+    Стан зберігається в LRU з обмеженням кількості користувачів - бакет
+    неактивного користувача однаково був би повним. Замість виконання
+    відкинутої дії користувач отримує ввічливу відповідь (на кнопку - завжди,
+    на повідомлення - один раз, поки бакет не поповниться).
+    """
+
+    def __init__(
+        self,
+        rate: float = settings.THROTTLE_RATE,
+        burst: int = settings.THROTTLE_BURST,
+        heavy_rate: float = settings.THROTTLE_HEAVY_RATE,
+        heavy_burst: int = settings.THROTTLE_HEAVY_BURST,
+        max_users: int = settings.THROTTLE_MAX_USERS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.limits = {False: (rate, burst), True: (heavy_rate, heavy_burst)}
+        self.max_users = max_users
+        self._clock = clock
+        self._buckets: OrderedDict[tuple[int, bool], TokenBucket] = OrderedDict()
+        self.throttled = 0
+
+    @staticmethod
+    def is_heavy(event: TelegramObject) -> bool:
+        return isinstance(event, CallbackQuery) and (event.data or "").startswith(HEAVY_CALLBACK_PREFIXES)
+
+    def allow(self, user_id: int, heavy: bool) -> tuple[bool, TokenBucket]:
+        rate, capacity = self.limits[heavy]
+        now = self._clock()
+        key = (user_id, heavy)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(capacity, now)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.consume(rate, capacity, now), bucket
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        heavy = self.is_heavy(event)
+        allowed, bucket = self.allow(user.id, heavy)
+        if allowed:
+            return await handler(event, data)
+
+        self.throttled += 1
+        text = THROTTLE_HEAVY_MESSAGE if heavy else THROTTLE_MESSAGE
+        if isinstance(event, CallbackQuery):
+            # Відповідь на callback обов'язкова, інакше кнопка "висить" з годинником
+            await event.answer(text, show_alert=heavy)
+        elif isinstance(event, Message) and not bucket.warned:
+            await event.answer(text)
+        bucket.warned = True
+        return None
+
+# Інші зміни повідомлення - збережений відбиток більше не відповідає вмісту
+_INVALIDATING_METHODS = (EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup, DeleteMessage)
+
+
+class EditDeduplicationMiddleware(BaseRequestMiddleware):
+    """
+    Пропуск edit_text, що не змінює повідомлення.
+
+    Для кожного повідомлення бота зберігається відбиток (blake2b тексту,
+    parse_mode та JSON клавіатури) останнього вмісту, який бот у нього відправив.
+    Якщо новий edit_text дає той самий відбиток, запит до Telegram не робиться;
+    помилка "message is not modified" теж вважається успіхом, а не причиною
+    надсилати дубль через answer.
+    """
+
+    def __init__(self, max_messages: int = settings.MESSAGE_FINGERPRINT_CACHE_SIZE) -> None:
+        self.fingerprints = LRUDict(max_messages)
+        self.skipped = 0
+
+    @staticmethod
+    def _key(method: TelegramMethod[Any]) -> tuple | None:
+        inline_message_id = getattr(method, "inline_message_id", None)
+        if inline_message_id:
+            return "inline", inline_message_id
+        chat_id = getattr(method, "chat_id", None)
+        message_id = getattr(method, "message_id", None)
+        if chat_id is None or message_id is None:
+            return None
+        return chat_id, message_id
+
+    @staticmethod
+    def _fingerprint(bot: Bot, method: SendMessage | EditMessageText) -> str:
+        parse_mode = method.parse_mode
+        if isinstance(parse_mode, Default):
+            parse_mode = bot.default[parse_mode.name]
+        markup = method.reply_markup
+        # Закешовані клавіатури вже мають готовий JSON (keyboards.PreparedMarkupSession)
+        markup_json = bot.session.prepare_value(markup, bot=bot, files={}) if markup else ""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (method.text, str(parse_mode), markup_json):
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[Any],
+        bot: Bot,
+        method: TelegramMethod[Any],
+    ) -> Any:
+        if isinstance(method, EditMessageText):
+            key = self._key(method)
+            if key is None:
+                return await make_request(bot, method)
+            fingerprint = self._fingerprint(bot, method)
+            if self.fingerprints.get(key) == fingerprint:
+                self.skipped += 1
+                return True
+            try:
+                result = await make_request(bot, method)
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    self.fingerprints.put(key, fingerprint)
+                    return True
+                self.fingerprints.discard(key)
+                raise
+            self.fingerprints.put(key, fingerprint)
+            return result
+
+        result = await make_request(bot, method)
+        if isinstance(method, SendMessage) and isinstance(result, Message):
+            key = (result.chat.id, result.message_id)
+            self.fingerprints.put(key, self._fingerprint(bot, method))
+        elif isinstance(method, _INVALIDATING_METHODS):
+            key = self._key(method)
+            if key is not None:
+                self.fingerprints.discard(key)
+        return result
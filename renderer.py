@@ -0,0 +1,130 @@
+"""Пул процесів для рендерингу графіків поза event loop"""
+import asyncio
+import logging
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import charts
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RendererBusyError(RuntimeError):
+    """Черга рендерингу переповнена"""
+
+
+class ChartRenderer:
+    """
+    Обмежений ProcessPoolExecutor з прогрітими процесами (matplotlib уже імпортовано).
+    Приймає прості дані, повертає PNG-байти; глобальний стан pyplot живе
+    лише в процесах-воркерах і не використовується конкурентно.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, timeout: float = 30.0) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Кількість завдань у роботі та в черзі"""
+        return self._pending
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: не форкаємо процес з потоками aiosqlite та event loop
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=charts.init_worker,
+        )
+
+    async def start(self) -> None:
+        """Запустити процеси та дочекатися, поки кожен завантажить matplotlib"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, charts.warm_up) for _ in range(self.workers))
+        )
+        logger.info("Рендерер графіків готовий: %s процесів", len(set(pids)))
+
+    async def render(self, func: Callable[..., bytes], *args) -> bytes:
+        """
+        Виконати функцію з charts у пулі та повернути PNG.
+        RendererBusyError - у черзі вже max_pending графіків,
+        TimeoutError - графік не готовий за timeout секунд.
+        """
+        if self._pending >= self.max_pending:
+            raise RendererBusyError("Забагато графіків у черзі")
+        if self._executor is None:
+            self._executor = self._create_executor()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            job = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+        # Слот звільняється, коли завдання завершилось у процесі, а не коли вийшов
+        # таймаут очікування: запущену функцію скасувати не можна, вона працює далі
+        self._pending += 1
+        job.add_done_callback(lambda _: self._release_soon(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except TimeoutError:
+            logger.warning("Графік не готовий за %s с, завдання ще виконується", self.timeout)
+            raise
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+
+    def _release_soon(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Колбек concurrent.futures викликається з потоку пулу
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # event loop уже закрито - рахувати нікому
+            pass
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        if self._executor is not executor:
+            return
+        logger.error("Процес рендерера завершився аварійно, пул перезапускається")
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def shutdown(self) -> None:
+        """Зупинити процеси рендерера"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_renderer: ChartRenderer | None = None
+
+
+def get_renderer() -> ChartRenderer:
+    """Рендерер графіків (створюється при першому зверненні)"""
+    global _renderer
+    if _renderer is None:
+        _renderer = ChartRenderer(
+            workers=settings.RENDER_WORKERS,
+            max_pending=settings.RENDER_MAX_PENDING,
+            timeout=settings.RENDER_TIMEOUT,
+        )
+    return _renderer
+
+
+def shutdown_renderer() -> None:
+    global _renderer
+    if _renderer is not None:
+        _renderer.shutdown()
+        _renderer = None
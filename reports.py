@@ -1,19 +1,57 @@
+import asyncio
+import csv
+import functools
 import io
 import logging
-
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import pandas as pd
+import sqlite3
+import tempfile
 from datetime import datetime, timedelta
 
-from database import get_transactions, get_category_summary, get_balance
+import charts
+from cache import BytesLRUCache, SingleFlight
+from config import settings
+from database import (
+    get_balance,
+    get_category_summary,
+    get_data_version,
+    get_monthly_totals,
+    get_period_summary,
+    iter_transactions,
+)
+from renderer import RendererBusyError, get_renderer
+from rollups import month_range, shift_month
 
 logger = logging.getLogger(__name__)
 
-# Налаштування для українських символів
-plt.rcParams["font.family"] = "DejaVu Sans"
-plt.rcParams["axes.unicode_minus"] = False
+EXPORT_COLUMNS = ['ID', 'User ID', 'Тип', 'Сума', 'Категорія', 'Опис', 'Дата', 'Створено']
+
+# Готові PNG за ключем (user_id, вид графіка, вікно дат, версія даних користувача)
+chart_cache = BytesLRUCache(settings.CHART_CACHE_MAX_BYTES)
+
+# Однакові одночасні запити (подвійне натискання, кілька вкладок) виконуються один раз
+flights = SingleFlight()
+
+
+def single_flight(func):
+    """Одночасні виклики з тими самими аргументами чекають один результат"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        return await flights.run(key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+
+async def artifact_key(user_id: int, kind: str):
+    """
+    Ключ готового файлу (графіка/експорту): вікна дат залежать лише від сьогоднішньої
+    дати, тож (користувач, вид, дата, версія даних) однозначно визначає вміст.
+    None - версію отримати не вдалося, кешувати не можна.
+    """
+    version = await get_data_version(user_id)
+    if version < 0:
+        return None
+    return user_id, kind, datetime.now().strftime('%Y-%m-%d'), version
 
 
 def _strip_emoji_for_chart(text: str) -> str:
@@ -34,22 +72,22 @@ def _strip_emoji_for_chart(text: str) -> str:
     return result if result else "?"
 
 
+@single_flight
 async def generate_report(user_id: int, start_date: str, end_date: str, period_name: str):
     """Згенерувати текстовий звіт"""
     try:
-        # Отримати баланс
-        income_total, expense_total, balance = await get_balance(user_id)
-        
-        # Отримати транзакції за період
-        transactions = await get_transactions(user_id, start_date, end_date)
-        
-        # Підрахувати за період
-        period_income = sum(t[3] for t in transactions if t[2] == 'income')
-        period_expense = sum(t[3] for t in transactions if t[2] == 'expense')
+        # Баланс і підсумок за період - незалежні запити на різних з'єднаннях пулу
+        (income_total, expense_total, balance), summary = await asyncio.gather(
+            get_balance(user_id),
+            get_period_summary(user_id, start_date, end_date),
+        )
         
-        # Отримати підсумок по категоріях
-        expense_categories = await get_category_summary(user_id, start_date, end_date, 'expense')
-        income_categories = await get_category_summary(user_id, start_date, end_date, 'income')
+        # Розбивка по категоріях і суми за період (з rollup-сум, без вибірки транзакцій)
+        expense_categories = [(cat, total, count) for t, cat, total, count in summary if t == 'expense']
+        income_categories = [(cat, total, count) for t, cat, total, count in summary if t == 'income']
+        period_income = sum(total for _, total, _ in income_categories)
+        period_expense = sum(total for _, total, _ in expense_categories)
+        period_count = sum(count for _, _, _, count in summary)
         
         # Формування звіту
         report = f"📊 <b>Звіт за період: {period_name}</b>\n"
@@ -76,27 +114,29 @@ async def generate_report(user_id: int, start_date: str, end_date: str, period_n
                 report += f"  {cat}: {total:,.2f} грн ({count} транз.)\n"
             report += "\n"
         
-        report += f"📊 Всього транзакцій за період: {len(transactions)}"
+        report += f"📊 Всього транзакцій за період: {period_count}"
         
         return report
     except Exception as e:
         return f"❌ Помилка генерації звіту: {str(e)}"
 
 
+@single_flight
 async def generate_pie_chart(user_id: int, trans_type: str, period_name: str):
     """Згенерувати кругову діаграму витрат/доходів"""
     try:
         # Визначити дати (місяць)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+        
+        # Той самий графік для тієї ж версії даних - з кешу
+        version = await get_data_version(user_id)
+        cache_key = (user_id, f"pie_{trans_type}_{period_name}", start_date, end_date, version)
+        if version >= 0 and (cached := chart_cache.get(cache_key)) is not None:
+            return cached
         
         # Отримати дані
-        categories = await get_category_summary(
-            user_id, 
-            start_date.strftime('%Y-%m-%d'),
-            end_date.strftime('%Y-%m-%d'),
-            trans_type
-        )
+        categories = await get_category_summary(user_id, start_date, end_date, trans_type)
         
         if not categories or len(categories) == 0:
             return None
@@ -104,111 +144,69 @@ async def generate_pie_chart(user_id: int, trans_type: str, period_name: str):
         # Підготовка даних (без емодзі для matplotlib)
         labels = [_strip_emoji_for_chart(cat[0]) for cat in categories]
         sizes = [cat[1] for cat in categories]
-        
-        # Створення діаграми
-        fig, ax = plt.subplots(figsize=(10, 8))
-        colors = plt.cm.Set3(range(len(labels)))
-        
-        wedges, texts, autotexts = ax.pie(
-            sizes, 
-            labels=labels, 
-            autopct='%1.1f%%', 
-            colors=colors, 
-            startangle=90
-        )
-        
-        # Поліпшення читабельності
-        for text in texts:
-            text.set_fontsize(10)
-        for autotext in autotexts:
-            autotext.set_color('white')
-            autotext.set_fontweight('bold')
-            autotext.set_fontsize(10)
-        
-        ax.axis('equal')
-        
         title = f"{'Витрати' if trans_type == 'expense' else 'Доходи'} за {period_name}"
-        plt.title(title, fontsize=16, fontweight='bold', pad=20)
-        
-        # Зберегти в пам'ять
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
         
-        return buf
+        # Рендеринг у пулі процесів (PNG-байти)
+        png = await get_renderer().render(charts.render_pie, labels, sizes, title)
+        if version >= 0:
+            chart_cache.put(cache_key, png)
+        return png
+    except (RendererBusyError, TimeoutError):
+        raise
     except Exception as e:
         logger.error("Помилка генерації графіка: %s", e)
         return None
 
 
-async def generate_dynamics_chart(user_id: int):
-    """Згенерувати графік динаміки за рік"""
+@single_flight
+async def generate_dynamics_chart(user_id: int, months: int | None = 12):
+    """
+    Згенерувати графік динаміки за останні months місяців (включно з поточним)
+    або за весь час (months=None)
+    """
     try:
-        # Визначити дати
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-        
-        # Отримати транзакції
-        transactions = await get_transactions(
-            user_id,
-            start_date.strftime('%Y-%m-%d'),
-            end_date.strftime('%Y-%m-%d')
-        )
-        
-        if not transactions or len(transactions) == 0:
-            return None
-        
-        # Підготовка даних
-        df = pd.DataFrame(transactions, columns=[
-            'id', 'user_id', 'type', 'amount', 'category', 'description', 'date', 'created_at'
-        ])
-        df['date'] = pd.to_datetime(df['date'])
-        df['month'] = df['date'].dt.to_period('M')
-        
-        # Групування по місяцях
-        monthly_income = df[df['type'] == 'income'].groupby('month')['amount'].sum()
-        monthly_expense = df[df['type'] == 'expense'].groupby('month')['amount'].sum()
-        
-        # Перевірка чи є дані
-        if len(monthly_income) == 0 and len(monthly_expense) == 0:
-            return None
-        
-        # Створення всіх місяців
-        if len(df['month'].unique()) > 1:
-            all_months = pd.period_range(start=df['month'].min(), end=df['month'].max(), freq='M')
+        # Визначити дати: вікно вирівняне по місяцях, тож береться з rollup_monthly
+        today = datetime.now()
+        last_month = today.strftime('%Y-%m')
+        end_date = today.strftime('%Y-%m-%d')
+        if months:
+            start_date = f"{shift_month(last_month, 1 - months)}-01"
         else:
-            all_months = [df['month'].min()]
+            start_date = "0001-01-01"
         
-        monthly_income = monthly_income.reindex(all_months, fill_value=0)
-        monthly_expense = monthly_expense.reindex(all_months, fill_value=0)
+        version = await get_data_version(user_id)
+        cache_key = (user_id, "dynamics", start_date, end_date, version)
+        if version >= 0 and (cached := chart_cache.get(cache_key)) is not None:
+            return cached
         
-        # Створення графіка
-        fig, ax = plt.subplots(figsize=(12, 6))
+        # Суми по (місяць, тип) з GROUP BY по rollup-таблицях
+        monthly_totals = await get_monthly_totals(user_id, start_date, end_date)
         
-        x = range(len(all_months))
-        labels = [str(m) for m in all_months]
-        
-        ax.plot(x, monthly_income.values, marker='o', label='Доходи', linewidth=2, color='green', markersize=6)
-        ax.plot(x, monthly_expense.values, marker='o', label='Витрати', linewidth=2, color='red', markersize=6)
-        
-        ax.set_xlabel('Місяць', fontsize=12)
-        ax.set_ylabel('Сума (грн)', fontsize=12)
-        ax.set_title('Динаміка доходів та витрат', fontsize=16, fontweight='bold')
-        ax.legend(fontsize=12)
-        ax.grid(True, alpha=0.3)
-        ax.set_xticks(x)
-        ax.set_xticklabels(labels, rotation=45, ha='right')
-        
-        plt.tight_layout()
-        
-        # Зберегти в пам'ять
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
+        if not monthly_totals:
+            return None
         
-        return buf
+        # Заповнення пропущених місяців нулями
+        income: dict[str, float] = {}
+        expense: dict[str, float] = {}
+        for month, trans_type, total in monthly_totals:
+            target = income if trans_type == 'income' else expense
+            target[month] = target.get(month, 0.0) + total
+        
+        first_month = start_date[:7] if months else monthly_totals[0][0]
+        all_months = month_range(first_month, last_month)
+        
+        # Рендеринг у пулі процесів (PNG-байти)
+        png = await get_renderer().render(
+            charts.render_dynamics,
+            all_months,
+            [float(income.get(m, 0.0)) for m in all_months],
+            [float(expense.get(m, 0.0)) for m in all_months],
+        )
+        if version >= 0:
+            chart_cache.put(cache_key, png)
+        return png
+    except (RendererBusyError, TimeoutError):
+        raise
     except Exception as e:
         logger.error("Помилка генерації графіка динаміки: %s", e)
         return None
@@ -242,49 +240,137 @@ def get_period_dates(period: str):
     return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), period_name
 
 
-async def export_to_excel(user_id: int):
-    """Експорт даних в Excel"""
+EXCEL_SUMMARY_BY_MONTH = '''
+    SELECT month,
+           SUM(CASE WHEN type = 'income' THEN total ELSE 0 END),
+           SUM(CASE WHEN type = 'expense' THEN total ELSE 0 END),
+           SUM(count)
+    FROM rollup_monthly
+    WHERE user_id = ?
+    GROUP BY month
+    ORDER BY month
+'''
+
+EXCEL_SUMMARY_BY_CATEGORY = '''
+    SELECT type, category, SUM(total), SUM(count)
+    FROM rollup_monthly
+    WHERE user_id = ?
+    GROUP BY type, category
+    ORDER BY type, SUM(total) DESC
+'''
+
+
+def _header(ws, titles: list[str]) -> list:
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    cells = []
+    for title in titles:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    return cells
+
+
+def _write_excel(user_id: int, out, progress=None) -> bool:
+    """
+    Побудова книги Excel у write-only режимі openpyxl (виконується в потоці).
+    Рядки транзакцій ідуть прямо з курсора окремого синхронного з'єднання,
+    підсумкові аркуші рахуються SQL-агрегацією по rollup_monthly.
+    progress(кількість рядків) викликається після кожного пакета - з цього потоку.
+    Повертає False, якщо транзакцій немає.
+    """
+    from openpyxl import Workbook
+
+    conn = sqlite3.connect(settings.DB_NAME, timeout=settings.DB_BUSY_TIMEOUT / 1000)
     try:
-        transactions = await get_transactions(user_id)
-        
-        if not transactions or len(transactions) == 0:
+        conn.execute("PRAGMA query_only = ON")
+        cursor = conn.execute(
+            'SELECT * FROM transactions WHERE user_id = ? ORDER BY date DESC, created_at DESC',
+            (user_id,)
+        )
+        rows = cursor.fetchmany(settings.EXPORT_CHUNK_SIZE)
+        if not rows:
+            return False
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Транзакції')
+        ws.append(_header(ws, EXPORT_COLUMNS))
+        rows_written = 0
+        while rows:
+            for row in rows:
+                ws.append(row)
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written)
+            rows = cursor.fetchmany(settings.EXPORT_CHUNK_SIZE)
+
+        ws = wb.create_sheet('По місяцях')
+        ws.append(_header(ws, ['Місяць', 'Доходи', 'Витрати', 'Різниця', 'Кількість']))
+        for month, income, expense, count in conn.execute(EXCEL_SUMMARY_BY_MONTH, (user_id,)):
+            ws.append([month, income, expense, income - expense, count])
+
+        ws = wb.create_sheet('По категоріях')
+        ws.append(_header(ws, ['Тип', 'Категорія', 'Сума', 'Кількість']))
+        for trans_type, category, total, count in conn.execute(EXCEL_SUMMARY_BY_CATEGORY, (user_id,)):
+            ws.append(['Дохід' if trans_type == 'income' else 'Витрата', category, total, count])
+
+        wb.save(out)
+        return True
+    finally:
+        conn.close()
+
+
+async def export_to_excel(user_id: int, progress=None):
+    """
+    Експорт даних в Excel: аркуш транзакцій та підсумки по місяцях і категоріях.
+    Книга будується в окремому потоці, щоб не блокувати event loop,
+    і пишеться у SpooledTemporaryFile (як і CSV).
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES)
+    try:
+        if not await asyncio.to_thread(_write_excel, user_id, out, progress):
+            out.close()
             return None
-        
-        df = pd.DataFrame(transactions, columns=[
-            'ID', 'User ID', 'Тип', 'Сума', 'Категорія', 'Опис', 'Дата', 'Створено'
-        ])
-        
-        # Зберегти в пам'ять
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Транзакції')
-        buf.seek(0)
-        
-        return buf
+        out.seek(0)
+        return out
     except Exception as e:
         logger.error("Помилка експорту в Excel: %s", e)
+        out.close()
         return None
 
 
-async def export_to_csv(user_id: int):
-    """Експорт даних в CSV"""
+async def export_to_csv(user_id: int, progress=None):
+    """
+    Експорт даних в CSV (UTF-8 з BOM).
+    Рядки пишуться пакетами прямо з курсора у SpooledTemporaryFile: до
+    EXPORT_SPOOL_MAX_BYTES файл у пам'яті, далі - на диску.
+    progress(кількість рядків) викликається після кожного пакета.
+    """
+    out = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES)
     try:
-        transactions = await get_transactions(user_id)
-        
-        if not transactions or len(transactions) == 0:
+        out.write('\ufeff'.encode('utf-8'))
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_COLUMNS)
+        rows_written = 0
+        async for rows in iter_transactions(user_id, settings.EXPORT_CHUNK_SIZE):
+            writer.writerows(rows)
+            rows_written += len(rows)
+            out.write(text.getvalue().encode('utf-8'))
+            if progress:
+                progress(rows_written)
+            text.seek(0)
+            text.truncate()
+        
+        if rows_written == 0:
+            out.close()
             return None
         
-        df = pd.DataFrame(transactions, columns=[
-            'ID', 'User ID', 'Тип', 'Сума', 'Категорія', 'Опис', 'Дата', 'Створено'
-        ])
-        
-        # Зберегти в пам'ять
-        buf = io.BytesIO()
-        csv_string = df.to_csv(index=False, encoding='utf-8-sig')
-        buf.write(csv_string.encode('utf-8-sig'))
-        buf.seek(0)
-        
-        return buf
+        out.seek(0)
+        return out
     except Exception as e:
         logger.error("Помилка експорту в CSV: %s", e)
+        out.close()
         return None
+
@@ -0,0 +1,165 @@
+"""Попередньо агреговані суми транзакцій (rollup) та запити по довільних діапазонах дат"""
+from datetime import date, timedelta
+
+# Суми по (користувач, місяць/день, тип, категорія); підтримуються тригерами
+ROLLUP_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_monthly (
+        user_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, month, type, category)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS rollup_daily (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        type TEXT NOT NULL,
+        category TEXT NOT NULL,
+        total REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, date, type, category)
+    ) WITHOUT ROWID
+    ''',
+)
+
+_ADD = '''
+        INSERT INTO rollup_monthly (user_id, month, type, category, total, count)
+        VALUES (NEW.user_id, substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+        ON CONFLICT(user_id, month, type, category) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1;
+        INSERT INTO rollup_daily (user_id, date, type, category, total, count)
+        VALUES (NEW.user_id, NEW.date, NEW.type, NEW.category, NEW.amount, 1)
+        ON CONFLICT(user_id, date, type, category) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + 1;
+'''
+
+_SUBTRACT = '''
+        UPDATE rollup_monthly SET total = total - OLD.amount, count = count - 1
+        WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7)
+          AND type = OLD.type AND category = OLD.category;
+        DELETE FROM rollup_monthly
+        WHERE user_id = OLD.user_id AND month = substr(OLD.date, 1, 7)
+          AND type = OLD.type AND category = OLD.category AND count <= 0;
+        UPDATE rollup_daily SET total = total - OLD.amount, count = count - 1
+        WHERE user_id = OLD.user_id AND date = OLD.date
+          AND type = OLD.type AND category = OLD.category;
+        DELETE FROM rollup_daily
+        WHERE user_id = OLD.user_id AND date = OLD.date
+          AND type = OLD.type AND category = OLD.category AND count <= 0;
+'''
+
+ROLLUP_TRIGGERS = (
+    f'''
+    CREATE TRIGGER trg_rollups_insert AFTER INSERT ON transactions
+    BEGIN{_ADD}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER trg_rollups_delete AFTER DELETE ON transactions
+    BEGIN{_SUBTRACT}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER trg_rollups_update
+    AFTER UPDATE OF user_id, type, amount, category, date ON transactions
+    BEGIN{_SUBTRACT}{_ADD}
+    END
+    ''',
+)
+
+REBUILD_ROLLUPS = (
+    '''
+    INSERT INTO rollup_monthly (user_id, month, type, category, total, count)
+    SELECT user_id, substr(date, 1, 7), type, category, SUM(amount), COUNT(*)
+    FROM transactions
+    GROUP BY user_id, substr(date, 1, 7), type, category
+    ''',
+    '''
+    INSERT INTO rollup_daily (user_id, date, type, category, total, count)
+    SELECT user_id, date, type, category, SUM(amount), COUNT(*)
+    FROM transactions
+    GROUP BY user_id, date, type, category
+    ''',
+)
+
+
+def _month_end(day: date) -> date:
+    """Останній день місяця"""
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def shift_month(month: str, delta: int) -> str:
+    """Зсунути місяць 'YYYY-MM' на delta місяців"""
+    year, mon = map(int, month.split("-"))
+    index = year * 12 + mon - 1 + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def month_range(first: str, last: str) -> list[str]:
+    """Усі місяці 'YYYY-MM' від first до last включно (для заповнення пропусків)"""
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = shift_month(month, 1)
+    return months
+
+
+def split_range(start_date: str, end_date: str) -> tuple[tuple[str, str] | None, list[tuple[str, str]]]:
+    """
+    Розбити діапазон дат на цілі місяці та денні краї.
+    Повертає ((перший_місяць, останній_місяць) або None, [(з, по), ...]).
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    if start > end:
+        return None, []
+
+    first_full = start if start.day == 1 else _month_end(start) + timedelta(days=1)
+    last_full_end = end if end == _month_end(end) else end.replace(day=1) - timedelta(days=1)
+    if first_full > last_full_end:
+        return None, [(start.isoformat(), end.isoformat())]
+
+    months = (first_full.strftime("%Y-%m"), last_full_end.strftime("%Y-%m"))
+    days: list[tuple[str, str]] = []
+    if start < first_full:
+        days.append((start.isoformat(), (first_full - timedelta(days=1)).isoformat()))
+    if end > last_full_end:
+        days.append(((last_full_end + timedelta(days=1)).isoformat(), end.isoformat()))
+    return months, days
+
+
+def rollup_source(
+    user_id: int, start_date: str, end_date: str, trans_type: str | None = None
+) -> tuple[str, list]:
+    """
+    SQL-підзапит з колонками (type, category, month, total, count) за діапазон дат:
+    цілі місяці беруться з rollup_monthly, краї - з rollup_daily.
+    """
+    months, days = split_range(start_date, end_date)
+    type_filter = " AND type = ?" if trans_type else ""
+    parts: list[str] = []
+    params: list = []
+    if months:
+        parts.append(
+            "SELECT type, category, month, total, count FROM rollup_monthly "
+            "WHERE user_id = ? AND month BETWEEN ? AND ?" + type_filter
+        )
+        params += [user_id, *months] + ([trans_type] if trans_type else [])
+    for day_from, day_to in days:
+        parts.append(
+            "SELECT type, category, substr(date, 1, 7) AS month, total, count FROM rollup_daily "
+            "WHERE user_id = ? AND date BETWEEN ? AND ?" + type_filter
+        )
+        params += [user_id, day_from, day_to] + ([trans_type] if trans_type else [])
+    if not parts:
+        return "SELECT type, category, month, total, count FROM rollup_monthly WHERE 0", []
+    return " UNION ALL ".join(parts), params
@@ -1,17 +1,23 @@
 """Сервісні функції для handlers"""
 import logging
-from datetime import datetime
+from collections.abc import Awaitable, Callable
 
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, InputFile, Message
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE
 
-from database import check_budget, get_recent_transactions
+from cache import LRUDict
+from config import settings
+from database import RecordedTransaction, get_history_page
 from keyboards import back_button_kb, history_navigation_kb
 from texts import Messages
 from utils import escape_html
 
 logger = logging.getLogger(__name__)
 
+# file_id вже завантажених у Telegram файлів за ключем reports.artifact_key
+telegram_file_ids = LRUDict(settings.FILE_ID_CACHE_SIZE)
+
 
 async def safe_edit_or_answer(
     msg: Message,
@@ -20,28 +26,106 @@ async def safe_edit_or_answer(
     parse_mode: str = "HTML",
     reply_markup=None,
 ) -> None:
-    """Спроба edit_text; при помилці (фото/документ/застаріле повідомлення) - answer."""
+    """
+    Спроба edit_text; при помилці (фото/документ/застаріле повідомлення) - answer.
+    Незмінений вміст не редагується (middlewares.EditDeduplicationMiddleware),
+    а "message is not modified" не призводить до дубля повідомлення.
+    """
     try:
         await msg.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
-    except TelegramBadRequest:
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            return
         await msg.answer(text, parse_mode=parse_mode, reply_markup=reply_markup)
     except Exception as e:
         logger.warning("Помилка edit_text, fallback на answer: %s", e)
         await msg.answer(text, parse_mode=parse_mode, reply_markup=reply_markup)
 
 
+class FileObjectInputFile(InputFile):
+    """
+    Файл для завантаження в Telegram з відкритого файлового об'єкта
+    (напр. SpooledTemporaryFile експорту) - читається шматками, без read() усього.
+    """
+
+    def __init__(self, file, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot):
+        offset = 0
+        while True:
+            # seek перед кожним читанням: той самий файл можуть читати кілька завантажень
+            self.file.seek(offset)
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+
+async def resend_cached(send: Callable[..., Awaitable[Message]], key, **kwargs) -> bool:
+    """Надіслати файл за збереженим file_id (send - answer_photo/answer_document); False - його немає"""
+    file_id = telegram_file_ids.get(key) if key is not None else None
+    if not file_id:
+        return False
+    try:
+        await send(file_id, **kwargs)
+        return True
+    except TelegramBadRequest as e:
+        logger.warning("file_id більше не дійсний, завантажуємо заново: %s", e)
+        telegram_file_ids.discard(key)
+        return False
+
+
+async def answer_cached_media(
+    msg: Message,
+    key,
+    build: Callable[[], Awaitable[InputFile | None]],
+    *,
+    as_photo: bool,
+    caption: str,
+    reply_markup=None,
+) -> bool:
+    """
+    Надіслати графік/файл: якщо для ключа вже є file_id - повторно за ним, без
+    рендерингу та завантаження; інакше build() і запам'ятати отриманий file_id.
+    Повертає False, якщо даних для файлу немає.
+    """
+    send = msg.answer_photo if as_photo else msg.answer_document
+    if await resend_cached(send, key, caption=caption, reply_markup=reply_markup):
+        return True
+
+    input_file = await build()
+    if input_file is None:
+        return False
+    sent = await send(input_file, caption=caption, reply_markup=reply_markup)
+    if key is not None:
+        media = (sent.photo[-1] if sent.photo else None) if as_photo else sent.document
+        if media is not None:
+            telegram_file_ids.put(key, media.file_id)
+    return True
+
+
 async def show_history_page(
     user_id: int,
     message: Message | CallbackQuery,
     page: int = 1,
     is_new_message: bool = False,
+    cursor=None,
 ) -> None:
-    """Показати сторінку історії транзакцій"""
+    """Показати сторінку історії транзакцій (cursor - з utils.parse_history_cursor)"""
     msg = message.message if isinstance(message, CallbackQuery) else message
     try:
         per_page = 5
-        offset = (page - 1) * per_page
-        transactions, total_count = await get_recent_transactions(user_id, per_page, offset)
+        if cursor is None:
+            # Без курсора (стара кнопка history_page_N) вибірка - перша сторінка
+            page = 1
+        transactions, total_count = await get_history_page(user_id, per_page, cursor)
+        if not transactions and cursor:
+            # Курсор застарів (дані видалено) - повертаємось на першу сторінку
+            page = 1
+            transactions, total_count = await get_history_page(user_id, per_page)
 
         if not transactions:
             text = Messages.HISTORY_EMPTY
@@ -51,7 +135,8 @@ async def show_history_page(
                 await safe_edit_or_answer(msg, text, reply_markup=back_button_kb())
             return
 
-        total_pages = (total_count + per_page - 1) // per_page
+        total_pages = max(1, (total_count + per_page - 1) // per_page)
+        page = min(page, total_pages)
         text = f"Історія транзакцій\n<i>Сторінка {page} з {total_pages} (всього: {total_count})</i>\n\n"
 
         for trans in transactions:
@@ -82,37 +167,28 @@ async def show_history_page(
             pass
 
 
-async def check_and_notify_budget(message: Message, category: str) -> None:
-    """Перевірка та сповіщення про бюджет"""
+async def check_and_notify_budget(message: Message, category: str, recorded: RecordedTransaction) -> None:
+    """Сповіщення про бюджети категорії за даними, повернутими record_transaction"""
     try:
-        user_id = message.from_user.id if message.from_user else 0
-        today = datetime.now()
-        start_of_month = today.replace(day=1).strftime("%Y-%m-%d")
-        end_of_month = today.strftime("%Y-%m-%d")
-        budget_amount, spent_amount = await check_budget(
-            user_id, category, "month", start_of_month, end_of_month
-        )
-        if budget_amount and budget_amount > 0:
-            percentage = (spent_amount / budget_amount) * 100
+        for period, budget in (("month", recorded.month_budget), ("year", recorded.year_budget)):
+            if budget is None or not budget.limit or budget.limit <= 0:
+                continue
+            percentage = (budget.spent / budget.limit) * 100
             if percentage >= 100:
-                await message.answer(
-                    Messages.BUDGET_WARNING_100.format(
-                        category=category,
-                        spent=spent_amount,
-                        budget=budget_amount,
-                        percent=percentage,
-                    ),
-                    parse_mode="HTML",
-                )
+                template = Messages.BUDGET_WARNING_100
             elif percentage >= 80:
-                await message.answer(
-                    Messages.BUDGET_WARNING_80.format(
-                        category=category,
-                        percent=percentage,
-                        spent=spent_amount,
-                        budget=budget_amount,
-                    ),
-                    parse_mode="HTML",
-                )
+                template = Messages.BUDGET_WARNING_80
+            else:
+                continue
+            await message.answer(
+                template.format(
+                    period=Messages.BUDGET_PERIODS[period],
+                    category=category,
+                    spent=budget.spent,
+                    budget=budget.limit,
+                    percent=percentage,
+                ),
+                parse_mode="HTML",
+            )
     except Exception as e:
         logger.error("Помилка перевірки бюджету: %s", e)
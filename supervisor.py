@@ -0,0 +1,277 @@
+"""
+Супервізор кількох процесів-обробників.
+
+Супервізор сам отримує оновлення (long polling або webhook) і передає кожне
+в процес за user_id, тож усі оновлення користувача обробляє один процес: його
+стан FSM, кеш читань і черга експорту не розходяться між процесами. Процеси
+працюють з тією ж базою SQLite (WAL, busy_timeout), схему створює супервізор
+до їх запуску. Lock-файл тримає лише супервізор.
+
+Черги процесів обмежені: коли черга повна, webhook відповідає 429, а polling
+призупиняє отримання оновлень. Процес обробляє одночасно не більше
+WORKER_MAX_CONCURRENT_UPDATES оновлень і до того не бере нові з черги.
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import GetUpdates
+
+from config import settings
+from database import check_db_health, close_db, init_db
+
+if TYPE_CHECKING:
+    from multiprocessing.queues import Queue
+
+    UpdateQueue = Queue[dict[str, Any] | None]
+
+logger = logging.getLogger(__name__)
+
+POLLING_TIMEOUT = 10  # с, як у Dispatcher.start_polling
+MAX_POLLING_BACKOFF = 30.0
+QUEUE_FULL_BACKOFF = 0.5  # с очікування місця в черзі процесу при polling
+
+_STOP = None
+
+
+def update_user_id(update: dict[str, Any]) -> int | None:
+    """Користувач-ініціатор оновлення (from/user вкладеного об'єкта), інакше id чату"""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        for field in ("from", "user"):
+            user = event.get(field)
+            if isinstance(user, dict) and "id" in user:
+                return user["id"]
+        chat = event.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return None
+
+
+def shard_of(user_id: int, workers: int) -> int:
+    return user_id % workers
+
+
+class Supervisor:
+    """Процеси-обробники (spawn) з власними чергами оновлень і перезапуском після збою"""
+
+    def __init__(self, workers: int, queue_size: int = 1000) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queues: list[UpdateQueue] = [self._new_queue() for _ in range(workers)]
+        self._processes: list[BaseProcess | None] = [None] * workers
+        self._stopping = False
+        self.routed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _new_queue(self) -> "UpdateQueue":
+        return self._ctx.Queue(maxsize=self.queue_size)
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info("Запущено %s процесів-обробників", self.workers)
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(index, self.workers, self._queues[index]),
+            name=f"finbot-worker-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _replace_queue(self, index: int) -> None:
+        """
+        Нова черга для перезапущеного процесу: впалий процес міг загинути всередині
+        get() і не відпустити блокування читання старої черги. Оновлення, що чекали
+        в ній, втрачаються.
+        """
+        old = self._queues[index]
+        self._queues[index] = self._new_queue()
+        old.cancel_join_thread()
+        old.close()
+
+    def route(self, update: dict[str, Any]) -> bool:
+        """
+        Поставити оновлення в чергу процесу його користувача без очікування
+        (webhook.UpdateOffer). False - черга процесу повна.
+        """
+        user_id = update_user_id(update)
+        index = shard_of(user_id if user_id is not None else update.get("update_id", 0), self.workers)
+        try:
+            self._queues[index].put_nowait(update)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.routed += 1
+        return True
+
+    async def poll(self, bot: Bot, allowed_updates: list[str]) -> None:
+        """Long polling у супервізорі: оновлення розподіляються, а не обробляються"""
+        offset = None
+        backoff = 1.0
+        kwargs = {}
+        if bot.session.timeout:
+            kwargs["request_timeout"] = int(bot.session.timeout + POLLING_TIMEOUT)
+        while True:
+            try:
+                updates = await bot(
+                    GetUpdates(offset=offset, timeout=POLLING_TIMEOUT, allowed_updates=allowed_updates),
+                    **kwargs,
+                )
+            except Exception as e:
+                logger.warning("Помилка отримання оновлень, повтор через %.0f с: %s", backoff, e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_POLLING_BACKOFF)
+                continue
+            backoff = 1.0
+            for update in updates:
+                data = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+                # Повна черга - чекаємо, не підтверджуючи оновлення через offset
+                while not self.route(data):
+                    await asyncio.sleep(QUEUE_FULL_BACKOFF)
+                offset = update.update_id + 1
+
+    async def monitor(self, interval: float = 1.0) -> None:
+        """Перезапуск процесів, що завершилися не за командою супервізора"""
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive() and not self._stopping:
+                    logger.error(
+                        "Процес-обробник %s завершився (код %s), перезапуск",
+                        index, process.exitcode,
+                    )
+                    self.restarts += 1
+                    self._replace_queue(index)
+                    self._spawn(index)
+
+    async def stop(self, timeout: float) -> None:
+        """Дати процесам обробити вже отримані оновлення і завершитися"""
+        self._stopping = True
+        for updates in self._queues:
+            try:
+                await asyncio.to_thread(updates.put, _STOP, True, timeout)
+            except queue.Full:
+                pass  # процес не розбирає чергу - нижче зупиняється примусово
+        for process in self._processes:
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                logger.warning("Процес %s не завершився за %s с, зупиняємо примусово", process.name, timeout)
+                process.terminate()
+                await asyncio.to_thread(process.join)
+        logger.info(
+            "Процеси-обробники зупинено: оновлень %s, відхилено %s, перезапусків %s",
+            self.routed, self.rejected, self.restarts,
+        )
+
+
+def worker_main(index: int, workers: int, updates: "UpdateQueue") -> None:
+    """Точка входу процесу-обробника"""
+    # Ctrl+C отримує вся група процесів - зупинкою керує супервізор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(index, workers, updates))
+
+
+async def _serve(index: int, workers: int, updates: "UpdateQueue") -> None:
+    from export_jobs import get_export_queue, shutdown_export_queue
+    from main import create_bot, create_dispatcher
+    from renderer import get_renderer, shutdown_renderer
+    from webhook import dispatcher_feed
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    feed = dispatcher_feed(dp)
+    loop = asyncio.get_running_loop()
+    # Остання задача кожного користувача: наступне оновлення чекає попереднє
+    tails: dict[int | None, asyncio.Task[None]] = {}
+    # Місця для оновлень в обробці: без вільного нове не береться з черги
+    slots = asyncio.Semaphore(settings.WORKER_MAX_CONCURRENT_UPDATES)
+
+    async def process(previous: asyncio.Task[None] | None, update: dict[str, Any]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await feed(bot, update)
+        except Exception as e:
+            logger.error("Помилка обробки оновлення %s: %s", update.get("update_id"), e)
+
+    def release(user_id: int | None, task: asyncio.Task[None]) -> None:
+        slots.release()
+        if tails.get(user_id) is task:
+            del tails[user_id]
+
+    try:
+        if not await check_db_health():
+            logger.warning("Перевірка з'єднань з БД не пройдена")
+        await get_renderer().start()
+        await get_export_queue().start(bot, owns=lambda user_id: shard_of(user_id, workers) == index)
+        logger.info("Процес-обробник %s готовий", index)
+
+        while True:
+            await slots.acquire()
+            update = await loop.run_in_executor(None, updates.get)
+            if update is _STOP:
+                break
+            user_id = update_user_id(update)
+            task = asyncio.create_task(process(tails.get(user_id), update))
+            tails[user_id] = task
+            task.add_done_callback(lambda done, user_id=user_id: release(user_id, done))
+
+        if tails:
+            await asyncio.wait(list(tails.values()))
+    finally:
+        await shutdown_export_queue()
+        shutdown_renderer()
+        await dp.storage.close()
+        await close_db()
+        await bot.session.close()
+        logger.info("Процес-обробник %s зупинено", index)
+
+
+async def run_supervisor(workers: int) -> None:
+    """Режим кількох процесів: схема БД, запуск обробників, отримання оновлень"""
+    from handlers import register_handlers
+    from main import create_bot, set_commands
+
+    # Схема та похідні таблиці - один раз, до конкурентного доступу з процесів
+    try:
+        await init_db()
+        logger.info("База даних ініціалізована")
+    finally:
+        await close_db()
+
+    bot = create_bot()
+    # Dispatcher супервізора не обробляє оновлень - лише визначає allowed_updates
+    dp = Dispatcher()
+    register_handlers(dp)
+
+    supervisor = Supervisor(workers, settings.WORKER_QUEUE_SIZE)
+    supervisor.start()
+    monitor = asyncio.create_task(supervisor.monitor())
+    try:
+        await set_commands(bot)
+        if settings.RUN_MODE == "webhook":
+            from webhook import run_webhook
+
+            logger.info("Бот запущено успішно (webhook, %s процесів)", workers)
+            await run_webhook(dp, bot, offer=supervisor.route)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            logger.info("Бот запущено успішно (%s процесів)", workers)
+            await supervisor.poll(bot, dp.resolve_used_update_types())
+    finally:
+        monitor.cancel()
+        await supervisor.stop(settings.WORKER_SHUTDOWN_TIMEOUT)
+        await bot.session.close()
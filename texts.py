@@ -67,13 +67,14 @@ class Messages:
     )
 
     BUDGET_WARNING_100 = (
-        "Увага! Бюджет на категорію {category} перевищено!\n"
+        "Увага! Бюджет на категорію {category} ({period}) перевищено!\n"
         "Витрачено: {spent:.2f} / {budget:.2f} грн ({percent:.1f}%)"
     )
     BUDGET_WARNING_80 = (
-        "Увага! Ви витратили {percent:.1f}% бюджету на {category}\n"
+        "Увага! Ви витратили {percent:.1f}% бюджету на {category} ({period})\n"
         "Витрачено: {spent:.2f} / {budget:.2f} грн"
     )
+    BUDGET_PERIODS = {"month": "місячний", "year": "річний"}
 
     REPORTS = "Аналітика\n\nОберіть період:"
     BUDGETS = "Бюджети\n\nУправління бюджетами:"
@@ -35,3 +35,34 @@ def escape_html(text: str) -> str:
             .replace('"', '&quot;')
             .replace("'", '&#39;'))
 
+
+
+# Напрямки курсора історії: старші за курсор, новіші за курсор, починаючи з курсора
+HISTORY_OLDER = "n"
+HISTORY_NEWER = "p"
+HISTORY_ANCHOR = "a"
+
+
+def encode_history_cursor(page: int, direction: str, transaction) -> str:
+    """
+    Курсор сторінки історії для callback_data: page_напрям_дата_створено_id.
+    Ключ (date, created_at, id) зберігається лише цифрами, щоб вкластися в 64 байти.
+    """
+    trans_id, date, created_at = transaction[0], transaction[6], transaction[7]
+    date_digits = "".join(ch for ch in str(date) if ch.isdigit())
+    created_digits = "".join(ch for ch in str(created_at or "") if ch.isdigit())
+    return f"{page}_{direction}_{date_digits}_{created_digits}_{trans_id}"
+
+
+def parse_history_cursor(token: str) -> tuple[int, tuple[str, tuple[str, str, int]] | None]:
+    """Розібрати курсор історії: (сторінка, (напрям, (date, created_at, id)) або None)"""
+    parts = token.split("_")
+    page = max(1, int(parts[0]))
+    if len(parts) != 5:
+        return page, None
+    direction, d, c, trans_id = parts[1], parts[2], parts[3], int(parts[4])
+    if direction not in (HISTORY_OLDER, HISTORY_NEWER, HISTORY_ANCHOR) or len(d) != 8:
+        return page, None
+    date = f"{d[:4]}-{d[4:6]}-{d[6:]}"
+    created_at = f"{c[:4]}-{c[4:6]}-{c[6:8]} {c[8:10]}:{c[10:12]}:{c[12:14]}" if len(c) == 14 else c
+    return page, (direction, (date, created_at, trans_id))
@@ -0,0 +1,147 @@
+"""Webhook-режим: вбудований aiohttp-сервер з обмеженням одночасної обробки"""
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Передача одного оновлення (dict з тіла запиту) на обробку
+UpdateFeed = Callable[[Bot, dict[str, Any]], Awaitable[None]]
+# Передача оновлення далі без очікування (супервізор): False - немає місця
+UpdateOffer = Callable[[dict[str, Any]], bool]
+
+
+def dispatcher_feed(dp: Dispatcher, **data: Any) -> UpdateFeed:
+    """Обробка оновлення в цьому процесі диспетчером aiogram"""
+    async def feed(bot: Bot, update: dict[str, Any]) -> None:
+        result = await dp.feed_raw_update(bot=bot, update=update, **data)
+        if isinstance(result, TelegramMethod):
+            await dp.silent_call_request(bot=bot, result=result)
+
+    return feed
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Обробник webhook, що одразу відповідає 200, а оновлення обробляє у фоні.
+
+    Одночасно обробляється не більше max_concurrent оновлень, решта чекає на
+    семафорі. Якщо прийнятих і ще не оброблених більше max_pending, запит
+    відхиляється з 429 - Telegram повторить доставку пізніше, а пам'ять не
+    росте без меж. Якщо задано offer, оновлення не обробляється в цьому
+    процесі, а одразу передається далі (черги процесів-обробників супервізора);
+    відмова offer теж дає 429.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        secret_token: str | None = None,
+        max_concurrent: int = 64,
+        max_pending: int = 1000,
+        offer: UpdateOffer | None = None,
+        **data: Any,
+    ) -> None:
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_pending = max_pending
+        self.feed = dispatcher_feed(dispatcher, **data)
+        self.offer = offer
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.accepted = 0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        """Прийняті оновлення, обробка яких ще не завершилась"""
+        return len(self._background_feed_update_tasks)
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        async with self._semaphore:
+            try:
+                await self.feed(bot, update)
+            except Exception as e:
+                logger.error("Помилка обробки оновлення %s: %s", update.get("update_id"), e)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        try:
+            update = await request.json(loads=bot.session.json_loads)
+        except ValueError:
+            return web.Response(status=400, text="Invalid JSON")
+        if self.offer is not None:
+            if not self.offer(update):
+                self.rejected += 1
+                return web.Response(status=429, headers={"Retry-After": "1"})
+            self.accepted += 1
+            return web.json_response({}, dumps=bot.session.json_dumps)
+        self.accepted += 1
+        task = asyncio.create_task(self._background_feed_update(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        """Дочекатися прийнятих оновлень, потім закрити сесію бота"""
+        if self._background_feed_update_tasks:
+            logger.info("Очікування %s оновлень в обробці", self.pending)
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+        await super().close()
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, offer: UpdateOffer | None = None) -> None:
+    """
+    Запустити aiohttp-сервер на WEBHOOK_HOST:WEBHOOK_PORT і працювати до скасування.
+    Якщо WEBHOOK_URL задано - зареєструвати webhook у Telegram, інакше сервер
+    лише приймає POST з Update JSON (локальна перевірка).
+    """
+    app = web.Application()
+    handler = LimitedRequestHandler(
+        dp,
+        bot,
+        secret_token=settings.WEBHOOK_SECRET,
+        max_concurrent=settings.WEBHOOK_MAX_CONCURRENT_UPDATES,
+        max_pending=settings.WEBHOOK_MAX_PENDING_UPDATES,
+        offer=offer,
+    )
+    handler.register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+        await site.start()
+        logger.info(
+            "Webhook-сервер слухає %s:%s%s",
+            settings.WEBHOOK_HOST, settings.WEBHOOK_PORT, settings.WEBHOOK_PATH,
+        )
+        if settings.WEBHOOK_URL:
+            await bot.set_webhook(
+                settings.WEBHOOK_URL,
+                secret_token=settings.WEBHOOK_SECRET,
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=dp.resolve_used_update_types(),
+                drop_pending_updates=True,
+            )
+            logger.info("Webhook зареєстровано: %s", settings.WEBHOOK_URL)
+        else:
+            logger.warning("WEBHOOK_URL не задано - webhook у Telegram не реєструється")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        logger.info(
+            "Webhook-сервер зупинено: прийнято %s, відхилено %s",
+            handler.accepted, handler.rejected,
+        )